@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The interpreter's modules import each other by flat name from main/
+MAIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main')
+if MAIN_DIR not in sys.path:
+  sys.path.insert(0, MAIN_DIR)
@@ -0,0 +1,45 @@
+import argparse
+import sys
+
+from benchmarks import runner
+from benchmarks import micro, macro
+
+def main():
+  parser = argparse.ArgumentParser(prog='python -m benchmarks')
+  parser.add_argument('patterns', nargs='*', help='only run benchmarks matching these globs, e.g. "lexer.*"')
+  parser.add_argument('-r', '--repeat', type=int, default=5)
+  parser.add_argument('-o', '--output', help="write results as JSON to this file ('-' for stdout)")
+  parser.add_argument('-c', '--compare', help='compare against a baseline JSON file written with -o')
+  parser.add_argument('-t', '--threshold', type=float, default=0.1, help='relative change reported as faster/slower')
+  parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 if anything got slower')
+  parser.add_argument('-l', '--list', action='store_true', help='list benchmark names and exit')
+  args = parser.parse_args()
+
+  if args.list:
+    for name in runner.benchmarks:
+      print(name)
+    return 0
+
+  log = sys.stderr if args.output == '-' else sys.stdout
+  def report(name, result):
+    print(f"{name:<32} {runner.format_time(result['min']):>10} (median {runner.format_time(result['median'])})", file=log)
+
+  results = runner.run_benchmarks(args.patterns, args.repeat, report)
+  if args.output:
+    runner.dump(results, args.output)
+
+  if not args.compare:
+    return 0
+
+  rows = runner.compare(runner.load(args.compare), results, args.threshold)
+  print(f"\n{'benchmark':<32} {'baseline':>10} {'current':>10} {'ratio':>7}", file=log)
+  for name, old, new, ratio, status in rows:
+    ratio = f'{ratio:.2f}x' if ratio else '-'
+    print(f'{name:<32} {runner.format_time(old):>10} {runner.format_time(new):>10} {ratio:>7}  {status}', file=log)
+
+  if args.fail_on_regression and any(row[4] == 'slower' for row in rows):
+    return 1
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
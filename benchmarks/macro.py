@@ -0,0 +1,115 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+
+from benchmarks import MAIN_DIR
+from benchmarks.runner import benchmark
+from benchmarks.micro import arithmetic_script
+import main
+
+# PROGRAMS
+# Whole runs through main.run, the way the shell and RUN drive the language
+def clear_caches():
+  main.parse_cache.invalidate()
+  main.program_cache.invalidate()
+
+def quiet(fn):
+  def run():
+    with contextlib.redirect_stdout(io.StringIO()):
+      fn()
+  return run
+
+@benchmark('run.cold_script', number=3)
+def run_cold_script():
+  text = arithmetic_script(1000, seed=1)
+  def run():
+    clear_caches()
+    main.run('<benchmark>', text)
+  return run
+
+@benchmark('run.warm_script', number=20)
+def run_warm_script():
+  text = arithmetic_script(1000, seed=1)
+  return lambda: main.run('<benchmark>', text)
+
+@benchmark('run.test_lan', number=50)
+def run_test_lan():
+  fn = os.path.join(MAIN_DIR, 'test.lan')
+  with open(fn) as f:
+    text = f.read()
+  def run():
+    clear_caches()
+    main.run(fn, text)
+  return quiet(run)
+
+@benchmark('run.repl_lines', number=5)
+def run_repl_lines():
+  # Distinct one-line inputs, each parsed and compiled once as in the shell
+  lines = arithmetic_script(300, seed=2).splitlines()
+  def run():
+    clear_caches()
+    for line in lines:
+      main.run('<stdin>', line)
+  return run
+
+@benchmark('run.decimal_script', number=5)
+def run_decimal_script():
+  text = arithmetic_script(200, seed=1)
+  session = main.Session(numeric='decimal')
+  return lambda: session.run('<benchmark>', text)
+
+@benchmark('run.batch_formula', number=20)
+def run_batch_formula():
+  try:
+    import numpy as np
+  except ImportError:
+    return None
+  x = np.linspace(-100, 100, 10000)
+  return lambda: main.run_batch('<benchmark>', 'x ^ 2 + 2 * x + SIN(x) - 4', {'x': x})
+
+@benchmark('run.draw_sample', number=10)
+def run_draw_sample():
+  try:
+    import draw
+  except ImportError:
+    return None
+  from vector import evaluate
+  node, _ = main.parse('<benchmark>', 'TAN(x) + SIN(x * 50) * x')
+  context = main.default_session.new_context()
+  return lambda: draw.sample(lambda x: evaluate(node, context, {'x': x}, strict=False)[0], -360, 360)
+
+@benchmark('run.draw_batch', number=3)
+def run_draw_batch():
+  try:
+    import draw
+  except ImportError:
+    return None
+  import tempfile
+  texts = [f'DRAW(-360, 360, "SIN(x * {k}) * x")' for k in range(1, 9)]
+  # Each render writes into a directory of its own that goes away after it
+  def render():
+    with tempfile.TemporaryDirectory() as directory:
+      with draw.Batch(os.path.join(directory, 'plot_{n}.png'), workers=0):
+        for text in texts:
+          main.run('<benchmark>', text)
+  return render
+
+# STARTUP
+# A fresh interpreter per run, as the shell and one-off scripts start. Runs
+# that don't draw must never load matplotlib or NumPy, and fail if they do
+def python(code):
+  command = [sys.executable, '-c', code]
+  return lambda: subprocess.run(command, cwd=MAIN_DIR, check=True)
+
+@benchmark('startup.import_main', number=3)
+def startup_import_main():
+  return python("import sys, main; assert 'matplotlib' not in sys.modules and 'numpy' not in sys.modules")
+
+@benchmark('startup.first_run', number=3)
+def startup_first_run():
+  return python(
+    "import sys, main; main.run('<stdin>', 'VAR a = SIN(30) + LOG(100)\\nPRINT_RET(a)'); "
+    "assert 'matplotlib' not in sys.modules and 'numpy' not in sys.modules"
+  )
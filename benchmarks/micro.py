@@ -0,0 +1,183 @@
+import random
+
+from benchmarks.runner import benchmark
+from context import Context
+from lexer import Lexer
+from parser import Parser
+import main
+from main import Interpreter, Compiler, BuiltInFunction, Number, String, List
+
+# SCRIPTS
+# Generated from a fixed seed so every run measures the same text
+def arithmetic_script(lines, seed=0):
+  rng = random.Random(seed)
+  names = ['a', 'b', 'c']
+  script = ['VAR a = 3', 'VAR b = 4.5', 'VAR c = 7']
+
+  for i in range(lines):
+    # Divisors and exponents are literals so no line can fail or overflow
+    expr = rng.choice(names)
+    for _ in range(rng.randint(1, 5)):
+      op = rng.choice(['+', '-', '*', '/', '^'])
+      if op == '/':
+        expr += f' / {rng.randint(1, 99)}'
+      elif op == '^':
+        expr = f'({expr}) ^ 2'
+      else:
+        expr += f' {op} ' + rng.choice(names + [str(rng.randint(1, 99)), f'{rng.random() * 10:.3f}'])
+    if i % 10 == 0:
+      script.append(f'# line {i}')
+    script.append(f'VAR {rng.choice(names)} = ({expr}) % 1000')
+
+  return '\n'.join(script) + '\n'
+
+def nested_script(depth):
+  return '(' * depth + '1' + ' + 1)' * depth + '\n'
+
+def new_context():
+  context = Context('<benchmark>')
+  context.symbol_table = main.global_symbol_table
+  return context
+
+def parse(text):
+  tokens, error = Lexer('<benchmark>', text).make_tokens()
+  if error: raise error
+  result = Parser(tokens).parse()
+  if result.error: raise result.error
+  return result.node
+
+FORMULA = 'VAR y = (a * 2 + 1 - a / 4 + ABS(a)) ^ 2 % 97 + SIN(a) * COS(a) - MATH_PI\n' * 50
+TRIG = 'VAR y = SIN(a) * COS(a) + TAN(a / 2) - LOG(a + 1) + SQRT(a * a) + ABS(a)\n' * 50
+LISTS = 'VAR l = [1, 2, 3, 4, 5]\n' + 'VAR l = (l + 6) * [7, 8] - 0\n' * 50
+
+# LEXER
+@benchmark('lexer.large_script', number=5)
+def lexer_large_script():
+  text = arithmetic_script(2000)
+  return lambda: Lexer('<benchmark>', text).make_tokens()
+
+@benchmark('lexer.strings_and_comments', number=5)
+def lexer_strings_and_comments():
+  text = 'PRINT("a string with spaces, digits 123 and symbols +-*/") # a comment\n' * 2000
+  return lambda: Lexer('<benchmark>', text).make_tokens()
+
+# PARSER
+@benchmark('parser.large_script', number=5)
+def parser_large_script():
+  tokens, _ = Lexer('<benchmark>', arithmetic_script(2000)).make_tokens()
+  return lambda: Parser(tokens).parse()
+
+@benchmark('parser.nested_parens', number=50)
+def parser_nested_parens():
+  tokens, _ = Lexer('<benchmark>', nested_script(40)).make_tokens()
+  return lambda: Parser(tokens).parse()
+
+@benchmark('parser.long_chain', number=20)
+def parser_long_chain():
+  tokens, _ = Lexer('<benchmark>', ' + '.join(['1 * 2'] * 2000) + '\n').make_tokens()
+  return lambda: Parser(tokens).parse()
+
+@benchmark('parser.generated_formula', number=20)
+def parser_generated_formula():
+  # One machine-written formula with thousands of operators at every level
+  text = ' + '.join(f'SIN(x * {i}) ^ 2 - {i} / (x + 1) % 3' for i in range(500)) + '\n'
+  tokens, _ = Lexer('<benchmark>', text).make_tokens()
+  return lambda: Parser(tokens).parse()
+
+# EVALUATION
+@benchmark('interpreter.formula', number=20)
+def interpreter_formula():
+  node = parse('VAR a = 3\n' + FORMULA)
+  return lambda: Interpreter().visit(node, new_context())
+
+@benchmark('compiled.formula', number=50)
+def compiled_formula():
+  program = Compiler().compile(parse('VAR a = 3\n' + FORMULA))
+  return lambda: program(new_context())
+
+@benchmark('compiled.builtin_calls', number=50)
+def compiled_builtin_calls():
+  # Through compile_node, which calls builtins that can't be rebound directly
+  program = main.compile_node(parse('VAR a = 3\n' + TRIG))
+  return lambda: program(new_context())
+
+@benchmark('interpreter.lists', number=50)
+def interpreter_lists():
+  node = parse(LISTS)
+  return lambda: Interpreter().visit(node, new_context())
+
+@benchmark('compiled.lists', number=100)
+def compiled_lists():
+  program = Compiler().compile(parse(LISTS))
+  return lambda: program(new_context())
+
+@benchmark('compiled.name_lookups', number=200)
+def compiled_name_lookups():
+  # Builtins and session names read in a decimal session, whose constants
+  # sit in a table over the builtins
+  text = 'VAR a = 3\n' + 'SIN; COS; MATH_PI; NULL; a; LOG; MATH_E; a\n' * 50
+  program = Compiler().compile(parse(text))
+  session = main.Session(numeric='decimal')
+  return lambda: program(session.new_context())
+
+@benchmark('run.deep_nesting', number=5)
+def run_deep_nesting():
+  # Far deeper than Python's recursion limit, parsed and run from scratch
+  text = nested_script(20000)
+  def run():
+    main.parse_cache.invalidate()
+    main.program_cache.invalidate()
+    main.run('<benchmark>', text)
+  return run
+
+# BUILTINS
+# One benchmark per builtin, each calling it directly on a fixed argument
+def register_builtin(name, arg):
+  @benchmark(f'builtins.{name}', number=2000)
+  def builtin():
+    function = BuiltInFunction(name)
+    context = new_context()
+    return lambda: function.execute([arg], context, None, None)
+
+for name in ['abs', 'flr', 'ceil', 'log', 'sqrt', 'sin', 'cos', 'cot', 'tan', 'asin', 'acos', 'acot', 'atan']:
+  register_builtin(name, Number(0.5 if name in ('asin', 'acos') else 30))
+register_builtin('print_ret', Number(30))
+register_builtin('len', List([Number(i) for i in range(10)]))
+
+@benchmark('builtins.log_memoized', number=2000)
+def builtins_log_memoized():
+  function = BuiltInFunction('log')
+  main.memoize(function)
+  context = new_context()
+  arg = Number(30)
+  return lambda: function.execute([arg], context, None, None)
+
+# LISTS
+@benchmark('lists.append', number=200)
+def lists_append():
+  values = [Number(i) for i in range(100)]
+  def append():
+    list_ = List([])
+    for value in values:
+      list_, _ = list_.added_to(value)
+  return append
+
+@benchmark('lists.concat_and_remove', number=2000)
+def lists_concat_and_remove():
+  left = List([Number(i) for i in range(50)])
+  right = List([Number(i) for i in range(50)])
+  index = Number(10)
+  def concat_and_remove():
+    joined, _ = left.multed_by(right)
+    joined.subbed_by(index)
+  return concat_and_remove
+
+@benchmark('strings.concat', number=2000)
+def strings_concat():
+  left = String('a' * 50)
+  right = String('b' * 50)
+  count = Number(3)
+  def concat():
+    joined, _ = left.added_to(right)
+    joined.multed_by(count)
+  return concat
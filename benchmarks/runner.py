@@ -0,0 +1,104 @@
+import fnmatch
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+
+# REGISTRY
+# A benchmark is a setup function returning the callable to time; setup
+# work (generating scripts, parsing, compiling) is never measured.
+benchmarks = {}
+
+def benchmark(name, number=1):
+  def register(setup):
+    benchmarks[name] = (setup, number)
+    return setup
+  return register
+
+# MEASURE
+def measure(fn, number, repeat):
+  fn()
+  timings = []
+
+  for _ in range(repeat):
+    gc.collect()
+    gc.disable()
+    try:
+      start = time.perf_counter()
+      for _ in range(number):
+        fn()
+      timings.append((time.perf_counter() - start) / number)
+    finally:
+      gc.enable()
+
+  return {
+    'min': min(timings),
+    'median': statistics.median(timings),
+    'mean': statistics.mean(timings),
+    'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    'number': number,
+    'repeat': repeat,
+  }
+
+def run_benchmarks(patterns=None, repeat=5, report=None):
+  results = {}
+
+  for name, (setup, number) in benchmarks.items():
+    if patterns and not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+      continue
+    # A setup returns None when the benchmark can't run here (missing numpy)
+    fn = setup()
+    if fn is None: continue
+    results[name] = measure(fn, number, repeat)
+    if report: report(name, results[name])
+
+  return {
+    'meta': {
+      'python': platform.python_version(),
+      'implementation': platform.python_implementation(),
+      'platform': platform.platform(),
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    },
+    'results': results,
+  }
+
+# COMPARE
+def compare(baseline, current, threshold=0.1, key='min'):
+  rows = []
+
+  for name, result in current['results'].items():
+    old = baseline['results'].get(name)
+    if not old:
+      rows.append((name, None, result[key], None, 'new'))
+      continue
+
+    ratio = result[key] / old[key]
+    if ratio > 1 + threshold:
+      status = 'slower'
+    elif ratio < 1 - threshold:
+      status = 'faster'
+    else:
+      status = 'same'
+    rows.append((name, old[key], result[key], ratio, status))
+
+  return rows
+
+def format_time(seconds):
+  if seconds is None: return '-'
+  for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+    if seconds >= scale: return f'{seconds / scale:.2f} {unit}'
+  return f'{seconds / 1e-9:.0f} ns'
+
+def load(path):
+  with open(path) as f:
+    return json.load(f)
+
+def dump(data, path):
+  if path == '-':
+    json.dump(data, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return
+  with open(path, 'w') as f:
+    json.dump(data, f, indent=2)
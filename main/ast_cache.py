@@ -0,0 +1,94 @@
+from lexer import Lexer
+from parser import Parser
+from position import Source
+from serialize import Encoder, Decoder, FORMAT
+import hashlib
+import marshal
+import os
+import tempfile
+import zlib
+
+# AST CACHE
+# Parsed scripts are kept on disk in a __mfccache__ directory beside them,
+# the way Python keeps bytecode in __pycache__, as serialize trees that are
+# marshalled and zlib compressed. An entry is trusted while the script's
+# mtime and size still match, and otherwise only if the content hash does
+# too; anything else is parsed again and the entry rewritten. Turn it off
+# with ast_cache.enabled = False.
+MAGIC = b'MFCA'
+CACHE_DIR = '__mfccache__'
+
+enabled = True
+# Larger scripts are streamed a statement at a time instead of parsed whole
+max_size = 1 << 22
+
+def cache_path(fn):
+  head, tail = os.path.split(os.path.abspath(fn))
+  return os.path.join(head, CACHE_DIR, tail + '.ast')
+
+def content_hash(mapping):
+  return hashlib.blake2b(mapping, digest_size=16).digest()
+
+def load(fn, mapping, stat):
+  # Returns the program's ListNode with positions in mapping, or None when
+  # the script doesn't parse, leaving it to run up to its error
+  path = cache_path(fn)
+  source = Source(fn, mapping)
+  entry = read_entry(path)
+  digest = None
+
+  if entry and entry[0] == FORMAT and entry[2] == stat.st_size:
+    _, mtime, size, cached_digest, tree = entry
+    if mtime != stat.st_mtime_ns:
+      digest = content_hash(mapping)
+    if digest is None or digest == cached_digest:
+      # A damaged entry is parsed again like a stale one
+      try:
+        node = Decoder(source).decode(tree)
+      except Exception:
+        node = None
+      if node:
+        # Touched but unchanged, so the next check is the cheap one again
+        if digest: write_entry(path, (FORMAT, stat.st_mtime_ns, size, digest, tree))
+        return node
+
+  tokens, error = Lexer(fn, mapping).make_tokens()
+  if error: return None
+  ast = Parser(tokens).parse()
+  if ast.error: return None
+
+  write_entry(path, (FORMAT, stat.st_mtime_ns, stat.st_size, digest or content_hash(mapping), Encoder().encode(ast.node)))
+  return ast.node
+
+def read_entry(path):
+  try:
+    with open(path, 'rb') as f:
+      data = f.read()
+  except OSError:
+    return None
+
+  if not data.startswith(MAGIC): return None
+  try:
+    entry = marshal.loads(zlib.decompress(data[len(MAGIC):]))
+  except (EOFError, ValueError, TypeError, zlib.error):
+    return None
+  return entry if isinstance(entry, tuple) and len(entry) == 5 else None
+
+def write_entry(path, entry):
+  # Written to a temporary file of its own and renamed, so a reader never
+  # sees half an entry, even with threads writing the same one. A directory
+  # that can't be written just goes without a cache
+  directory, name = os.path.split(path)
+  temp = None
+  try:
+    os.makedirs(directory, exist_ok=True)
+    handle, temp = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory)
+    with os.fdopen(handle, 'wb') as f:
+      f.write(MAGIC + zlib.compress(marshal.dumps(entry), 1))
+    os.replace(temp, path)
+  except OSError:
+    if temp is None: return
+    try:
+      os.remove(temp)
+    except OSError:
+      pass
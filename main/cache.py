@@ -0,0 +1,59 @@
+from collections import OrderedDict
+from threading import Lock
+
+class LRUCache:
+  def __init__(self, maxsize=128):
+    self.maxsize = maxsize
+    self.entries = OrderedDict()
+    self.lock = Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key, default=None):
+    with self.lock:
+      if key in self.entries:
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return self.entries[key]
+      self.misses += 1
+      return default
+
+  def set(self, key, value):
+    with self.lock:
+      if self.maxsize <= 0: return
+      self.entries[key] = value
+      self.entries.move_to_end(key)
+      self.evict()
+
+  def resize(self, maxsize):
+    with self.lock:
+      self.maxsize = maxsize
+      self.evict()
+
+  def evict(self):
+    while len(self.entries) > max(self.maxsize, 0):
+      self.entries.popitem(last=False)
+
+  def invalidate(self, key=None):
+    with self.lock:
+      if key is None:
+        self.entries.clear()
+      else:
+        self.entries.pop(key, None)
+
+  def stats(self):
+    with self.lock:
+      lookups = self.hits + self.misses
+      return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': self.hits / lookups if lookups else 0.0,
+        'size': len(self.entries),
+        'maxsize': self.maxsize,
+      }
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __repr__(self):
+    return f'<LRUCache {self.stats()}>'
@@ -1,6 +1,20 @@
+from numeric import float_backend
+
 class Context:
+  # The session's numeric backend, shared by every context under it
+  numeric = float_backend
+
   def __init__(self, display_name, parent=None, parent_entry_pos=None):
     self.display_name = display_name
     self.parent = parent
     self.parent_entry_pos = parent_entry_pos
-    self.symbol_table = None
\ No newline at end of file
+    self.symbol_table = None
+    if parent: self.numeric = parent.numeric
+
+  def __getstate__(self):
+    # Contexts travel with errors between processes for the traceback only;
+    # the symbol table and backend stay behind
+    state = dict(self.__dict__)
+    state['symbol_table'] = None
+    state.pop('numeric', None)
+    return state
@@ -1,16 +1,109 @@
-import matplotlib.pyplot as plt
 import numpy as np
+import threading
 
-def draw_exp(inputx,inputy):
-    # 100 linearly spaced numbers
-    x = np.linspace(inputx[0],inputx[1],100)
+# matplotlib is imported where a plot is rendered, since it takes far longer
+# to load than anything else here
 
-    # the function, which is y = x^2 here
-    y = inputy
+# Settings for DRAW
+samples = 1000          # points on the first, even grid
+max_samples = 100000    # points after refinement, at most
+refine_rounds = 8       # times a steep interval can be split in half
+tolerance = 0.01        # an interval is steep if it climbs this share of the plot
+output = None           # a file to render to, with {n} for the plot number;
+                        # plots open in a window when this is None
+dpi = 100
 
+plots = 0
+
+def sample(function, x1, x2, points=None, max_points=None, rounds=None):
+    # function maps an array of x to an array of y, with NaN where the
+    # function isn't defined. The grid starts even and intervals that climb
+    # steeply or run into a gap are split until they flatten out, so steep
+    # regions get many points and flat ones few
+    points = max(points or samples, 2)
+    max_points = max_points or max_samples
+    rounds = refine_rounds if rounds is None else rounds
+
+    x = np.linspace(x1, x2, points)
+    y = np.asarray(function(x), dtype=float)
+
+    # Steepness is measured against the range the even grid sees, so points
+    # crowding in on a pole don't flatten everything else
+    ylim = view_range(y)
+    span = ylim[1] - ylim[0] if ylim else 0
+
+    for _ in range(rounds):
+        if len(x) >= max_points: break
+
+        idx = np.flatnonzero(steep_intervals(y, span))[:max_points - len(x)]
+        if not len(idx): break
+
+        mid = (x[idx] + x[idx + 1]) / 2
+        x = np.insert(x, idx + 1, mid)
+        y = np.insert(y, idx + 1, np.asarray(function(mid), dtype=float))
+
+    # Intervals still steep once split as far as they go are jumps (a pole,
+    # a step), and get a NaN so the line breaks instead of bridging them
+    finest = abs(x2 - x1) / (points - 1) / 2 ** rounds * 1.01
+    jumps = np.flatnonzero(steep_intervals(y, span) & (np.diff(x) <= finest) & np.isfinite(y[:-1]) & np.isfinite(y[1:]))
+    if len(jumps):
+        x = np.insert(x, jumps + 1, (x[jumps] + x[jumps + 1]) / 2)
+        y = np.insert(y, jumps + 1, np.nan)
+
+    return x, y, ylim
+
+def view_range(y):
+    # The y range to show: all of it, unless a few points (near a pole) run
+    # off far beyond the rest, which then sets the range instead
+    y = y[np.isfinite(y)]
+    if not len(y): return None
+
+    low, high = np.min(y), np.max(y)
+    inner_low, inner_high = np.percentile(y, [2, 98])
+    if inner_high > inner_low and high - low > 10 * (inner_high - inner_low):
+        low, high = inner_low, inner_high
+    if high == low: return None
+
+    margin = (high - low) * 0.05
+    return low - margin, high + margin
+
+def steep_intervals(y, span):
+    finite = np.isfinite(y)
+    with np.errstate(invalid='ignore'):
+        steep = np.abs(np.diff(y)) > span * tolerance
+
+    # Defined at one end only: the edge of a gap in the domain
+    return steep | (finite[:-1] != finite[1:])
+
+# RENDERING
+class Renderer:
+    # One figure, axes and line on the Agg canvas, redrawn for every plot
+    # rather than built anew, and without pyplot so it works headless
+    def __init__(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.fig = Figure()
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(1, 1, 1)
+        center_axes(self.ax)
+        self.line, = self.ax.plot([], [], 'r')
+
+    def render(self, x, y, ylim, path, dpi):
+        self.line.set_data(x, y)
+        self.ax.set_autoscale_on(True)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        if ylim: self.ax.set_ylim(*ylim)
+
+        # The format comes from the extension: .png, .svg, .pdf
+        self.fig.savefig(path, dpi=dpi)
+        return path
+
+renderer = None
+
+def center_axes(ax):
     # setting the axes at the centre
-    fig = plt.figure()
-    ax = fig.add_subplot(1, 1, 1)
     ax.spines['left'].set_position('center')
     ax.spines['bottom'].set_position('zero')
     ax.spines['right'].set_color('none')
@@ -18,8 +111,93 @@ def draw_exp(inputx,inputy):
     ax.xaxis.set_ticks_position('bottom')
     ax.yaxis.set_ticks_position('left')
 
+def draw_exp(x, y, ylim=None, path=None):
+    global plots, renderer
+
+    batch = current_batch()
+    if batch: return batch.add(x, y, ylim, path)
+
+    plots += 1
+    path = path or (output and output.format(n=plots))
+
+    if path:
+        if renderer is None: renderer = Renderer()
+        return renderer.render(x, y, ylim, path, dpi)
+
+    import matplotlib.pyplot as plt
+    fig = plt.figure()
+    ax = fig.add_subplot(1, 1, 1)
+    center_axes(ax)
+
     # plot the function
-    plt.plot(x,y, 'r')
+    ax.plot(x, y, 'r')
+    if ylim: ax.set_ylim(*ylim)
 
     # show the plot
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+# BATCH RENDERING
+# Inside a batch, DRAW queues its plot and moves on. Queued plots go to the
+# process pool a chunk at a time and each worker renders them all on its
+# own reused figure:
+#
+#   with draw.Batch('report/plot_{n}.svg') as batch:
+#     for text in formulas: main.run('<report>', text)
+#   batch.paths
+#
+# A batch belongs to the thread that opened it, so DRAWs run meanwhile by
+# other threads (other sessions of a server, say) aren't caught up in it.
+local = threading.local()
+
+def current_batch():
+    return getattr(local, 'batch', None)
+
+class Batch:
+    # workers=0 renders in this process instead, as each chunk fills
+    def __init__(self, output='plot_{n}.png', workers=None, chunksize=16):
+        self.output = output
+        self.workers = workers
+        self.chunksize = chunksize
+        self.queue = []
+        self.futures = []
+        self.paths = []
+        self.count = 0
+        self.previous = None
+
+    def add(self, x, y, ylim=None, path=None):
+        self.count += 1
+        path = path or self.output.format(n=self.count)
+        self.queue.append((x, y, ylim, path))
+        if len(self.queue) >= self.chunksize: self.submit()
+        return path
+
+    def submit(self):
+        if not self.queue: return
+        chunk, self.queue = self.queue, []
+
+        if self.workers == 0:
+            self.paths.extend(render_chunk(chunk, dpi))
+        else:
+            from parallel import worker_pool
+            self.futures.append(worker_pool(self.workers).submit(render_chunk, chunk, dpi))
+
+    def flush(self):
+        # Waits for every queued plot, raising the first rendering error
+        self.submit()
+        futures, self.futures = self.futures, []
+        for future in futures:
+            self.paths.extend(future.result())
+        return self.paths
+
+    def __enter__(self):
+        self.previous, local.batch = current_batch(), self
+        return self
+
+    def __exit__(self, *exc_info):
+        local.batch = self.previous
+        self.flush()
+
+def render_chunk(chunk, dpi):
+    global renderer
+    if renderer is None: renderer = Renderer()
+    return [renderer.render(x, y, ylim, path, dpi) for x, y, ylim, path in chunk]
@@ -1,12 +1,18 @@
 from strings_with_arrows import string_with_arrows
 
-class Error:
+class Error(Exception):
   def __init__(self, pos_start, pos_end, error_name, details):
+    super().__init__(details)
     self.pos_start = pos_start
     self.pos_end = pos_end
     self.error_name = error_name
     self.details = details
   
+  def __reduce__(self):
+    # Exception pickles by calling __init__ with self.args, which here is only
+    # the details; rebuild from the instance attributes instead
+    return (Exception.__new__, (self.__class__, *self.args), self.__dict__)
+
   def as_string(self):
     result  = f'{self.error_name}: {self.details}\n'
     result += f'File {self.pos_start.fn}, line {self.pos_start.ln + 1}'
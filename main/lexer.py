@@ -1,155 +1,97 @@
 from errors import IllegalCharError
-from constant import DIGITS, LETTERS, LETTERS_DIGITS
-from position import Position
+from position import Position, Source
 from tokens import *
+import re
+
+TOKEN_PATTERN = r'''
+   (?P<SKIP>[ \t]+|\#[^\n]*\n?)
+  |(?P<NEWLINE>[;\n])
+  |(?P<NUMBER>[0-9]+(?:\.[0-9]*)?)
+  |(?P<IDENTIFIER>[A-Za-z][A-Za-z0-9_]*)
+  |(?P<STRING>"[^"]*"?)
+  |(?P<OP>==|[-+*/%^()\[\]=,])
+'''
+
+TOKEN_REGEX = re.compile(TOKEN_PATTERN + '|(?P<ILLEGAL>.)', re.VERBOSE | re.DOTALL)
+# The same tokens over UTF-8 bytes (an mmap of a file), where an illegal
+# character is a whole multi-byte sequence rather than its first byte. A file
+# read as bytes keeps its CRLF line endings, so the \r is skipped like a space
+BYTES_TOKEN_REGEX = re.compile(
+  (TOKEN_PATTERN.replace(r'[ \t]+', r'[ \t]+|\r(?=\n)', 1) + r'|(?P<ILLEGAL>[\xc0-\xff][\x80-\xbf]*|.)').encode(),
+  re.VERBOSE | re.DOTALL
+)
+
+OP_TOKENS = {
+  '+': TT_PLUS,
+  '-': TT_MINUS,
+  '*': TT_MUL,
+  '/': TT_DIV,
+  '%': TT_MOD,
+  '^': TT_POW,
+  '(': TT_LPAREN,
+  ')': TT_RPAREN,
+  '[': TT_LSQUARE,
+  ']': TT_RSQUARE,
+  '=': TT_EQ,
+  '==': TT_EE,
+  ',': TT_COMMA,
+}
 
 class Lexer:
-  def __init__(self, fn, text):
+  # text is a str, or UTF-8 bytes or an mmap of them, which is lexed in place
+  # with positions as byte offsets. Errors search the text for its lines, so
+  # it has to have find, which a memoryview doesn't
+  def __init__(self, fn, text, line_offset=0):
+    if isinstance(text, memoryview):
+      raise TypeError('Lexer text must be str, bytes or mmap, not memoryview')
     self.fn = fn
     self.text = text
-    self.pos = Position(-1, 0, -1, fn, text)
-    self.current_char = None
-    self.advance()
-  
-  def advance(self):
-    self.pos.advance(self.current_char)
-    self.current_char = self.text[self.pos.idx] if self.pos.idx < len(self.text) else None
+    self.source = Source(fn, text, line_offset)
+    self.binary = not isinstance(text, str)
 
-  def make_tokens(self):
+  # start and stop lex a slice of the text, keeping positions in the whole
+  def make_tokens(self, start=0, stop=None):
+    source = self.source
+    binary = self.binary
     tokens = []
+    end = start
 
-    while self.current_char != None:
-      if self.current_char in ' \t':
-        self.advance()
-      elif self.current_char == '#':
-        self.skip_comment()
-      elif self.current_char in ';\n':
-        tokens.append(Token(TT_NEWLINE, pos_start=self.pos))
-        self.advance()
-      elif self.current_char in DIGITS:
-        tokens.append(self.make_number())
-      elif self.current_char in LETTERS:
-        tokens.append(self.make_identifier())
-      elif self.current_char == '"':
-        tokens.append(self.make_string())
-      elif self.current_char == '+':
-        tokens.append(Token(TT_PLUS, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == '-':
-        tokens.append(self.make_minus())
-      elif self.current_char == '*':
-        tokens.append(Token(TT_MUL, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == '/':
-        tokens.append(Token(TT_DIV, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == '%':
-        tokens.append(Token(TT_MOD, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == '^':
-        tokens.append(Token(TT_POW, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == '(':
-        tokens.append(Token(TT_LPAREN, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == ')':
-        tokens.append(Token(TT_RPAREN, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == '[':
-        tokens.append(Token(TT_LSQUARE, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == ']':
-        tokens.append(Token(TT_RSQUARE, pos_start=self.pos))
-        self.advance()
-      elif self.current_char == '=':
-        tokens.append(self.make_equals())
-      elif self.current_char == ',':
-        tokens.append(Token(TT_COMMA, pos_start=self.pos))
-        self.advance()
-      else:
-        pos_start = self.pos.copy()
-        char = self.current_char
-        self.advance()
-        return [], IllegalCharError(pos_start, self.pos, "'" + char + "'")
-
-    tokens.append(Token(TT_EOF, pos_start=self.pos))
-    return tokens, None
-
-  def make_number(self):
-    num_str = ''
-    dot_count = 0           
-    pos_start = self.pos.copy()
-
-    while self.current_char != None and self.current_char in DIGITS + '.':
-      if self.current_char == '.':
-        if dot_count == 1: break
-        dot_count += 1
-      num_str += self.current_char
-      self.advance()
+    for match in (BYTES_TOKEN_REGEX if binary else TOKEN_REGEX).finditer(self.text, start, len(self.text) if stop is None else stop):
+      kind = match.lastgroup
+      start, end = match.span()
 
-    if dot_count == 0:
-      return Token(TT_INT, int(num_str), pos_start, self.pos)
-    else:
-      return Token(TT_FLOAT, float(num_str), pos_start, self.pos)
+      if kind == 'SKIP':
+        continue
 
-  def make_string(self):
-    string = ''
-    pos_start = self.pos.copy()
-    escape_character = False
-    self.advance()
+      group = match.group()
+      if binary: group = group.decode('utf-8')
 
-    escape_characters = {
-      'n': '\n',
-      't': '\t'
-    }
-
-    while self.current_char != None and (self.current_char != '"' or escape_character):
-      if escape_character:
-        string += escape_characters.get(self.current_char, self.current_char)
-      else:
-        if self.current_char == '\\':
-          escape_character = True
+      if kind == 'NEWLINE':
+        tok_type, value = TT_NEWLINE, None
+      elif kind == 'NUMBER':
+        num_str = group
+        if '.' in num_str:
+          tok_type, value = TT_FLOAT, float(num_str)
         else:
-          string += self.current_char
-      self.advance()
-      escape_character = False
-    
-    self.advance()
-    return Token(TT_STRING, string, pos_start, self.pos)
-
-  def make_identifier(self):
-    id_str = ''
-    pos_start = self.pos.copy()
-
-    while self.current_char != None and self.current_char in LETTERS_DIGITS + '_':
-      id_str += self.current_char
-      self.advance()
-
-    tok_type = TT_KEYWORD if id_str in KEYWORDS else TT_IDENTIFIER
-    return Token(tok_type, id_str, pos_start, self.pos)
-
-  def make_minus(self):
-    tok_type = TT_MINUS
-    pos_start = self.pos.copy()
-    self.advance()
-
-    return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
-  
-  def make_equals(self):
-    tok_type = TT_EQ
-    pos_start = self.pos.copy()
-    self.advance()
-
-    if self.current_char == '=':
-      self.advance()
-      tok_type = TT_EE
-
-    return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
-
-  def skip_comment(self):
-    self.advance()
+          tok_type, value = TT_INT, int(num_str)
+      elif kind == 'IDENTIFIER':
+        value = group
+        tok_type = TT_KEYWORD if value in KEYWORDS else TT_IDENTIFIER
+      elif kind == 'STRING':
+        string = group
+        # An unterminated string runs one column past the end of the text
+        if len(string) == 1 or string[-1] != '"':
+          end += 1
+          value = string[1:]
+        else:
+          value = string[1:-1]
+        tok_type, value = TT_STRING, value.replace('\\', '')
+      elif kind == 'OP':
+        tok_type, value = OP_TOKENS[group], None
+      else:
+        return [], IllegalCharError(Position(start, source), Position(end, source, True), "'" + group + "'")
 
-    while self.current_char != '\n':
-      self.advance()
+      tokens.append(Token(tok_type, value, source, start, end))
 
-    self.advance()
+    tokens.append(Token(TT_EOF, None, source, end))
+    return tokens, None
@@ -1,50 +1,25 @@
-from symbol_table import SymbolTable
+from symbol_table import SymbolTable, table_of
 from strings_with_arrows import *
 from context import Context
+from cache import LRUCache
+from numeric import backend as numeric_backend, float_backend, convert, index
 from errors import RTError
-from draw import draw_exp
 from parser import Parser
 from lexer import Lexer
+from nodes import NumberNode, ListNode, VarAccessNode, VarAssignNode, BinOpNode, UnaryOpNode, CallNode, walk
 from tokens import *
 import math
-
-# RUNTIME RESULT
-class RTResult:
-  def __init__(self):
-    self.reset()
-
-  def reset(self):
-    self.value = None
-    self.error = None
-    self.func_return_value = None
-
-  def register(self, res):
-    self.error = res.error
-    self.func_return_value = res.func_return_value
-    return res.value
-
-  def success(self, value):
-    self.reset()
-    self.value = value
-    return self
-
-  def failure(self, error):
-    self.reset()
-    self.error = error
-    return self
-
-  def should_return(self):
-    # Note: this will allow you to continue and break outside the current function
-    return (
-      self.error or
-      self.func_return_value
-    )
+from fractions import Fraction
 
 # VALUES
+# Values are immutable and shared freely: a variable read or a call result
+# is handed on as is. Where a value came from in the source and which
+# context produced it are tracked by the evaluator beside the value, and
+# only stamped onto a copy (see positioned) when an error has to be built.
 class Value:
-  def __init__(self):
-    self.set_pos()
-    self.set_context()
+  pos_start = None
+  pos_end = None
+  context = None
 
   def set_pos(self, pos_start=None, pos_end=None):
     self.pos_start = pos_start
@@ -79,8 +54,8 @@ class Value:
   def get_comparison_ne(self, other):
     return None, self.illegal_operation(other)
 
-  def execute(self, args):
-    return RTResult().failure(self.illegal_operation())
+  def execute(self, args, context, pos_start, pos_end):
+    raise RTError(pos_start, pos_end, 'Illegal operation', context)
 
   def copy(self):
     raise Exception('No copy method defined')
@@ -107,19 +82,19 @@ class Number(Value):
 
   def added_to(self, other):
     if isinstance(other, Number):
-      return Number(self.value + other.value).set_context(self.context), None
+      return Number(self.value + other.value), None
     else:
       return None, Value.illegal_operation(self, other)
 
   def subbed_by(self, other):
     if isinstance(other, Number):
-      return Number(self.value - other.value).set_context(self.context), None
+      return Number(self.value - other.value), None
     else:
       return None, Value.illegal_operation(self, other)
 
   def multed_by(self, other):
     if isinstance(other, Number):
-      return Number(self.value * other.value).set_context(self.context), None
+      return Number(self.value * other.value), None
     else:
       return None, Value.illegal_operation(self, other)
 
@@ -132,7 +107,7 @@ class Number(Value):
           self.context
         )
 
-      return Number(self.value / other.value).set_context(self.context), None
+      return Number(self.value / other.value), None
     else:
       return None, Value.illegal_operation(self, other)
 
@@ -145,25 +120,25 @@ class Number(Value):
           self.context
         )
 
-      return Number(self.value % other.value).set_context(self.context), None
+      return Number(self.value % other.value), None
     else:
       return None, Value.illegal_operation(self, other)
 
   def powed_by(self, other):
     if isinstance(other, Number):
-      return Number(self.value ** other.value).set_context(self.context), None
+      return Number(self.value ** other.value), None
     else:
       return None, Value.illegal_operation(self, other)
 
   def get_comparison_eq(self, other):
     if isinstance(other, Number):
-      return Number(int(self.value == other.value)).set_context(self.context), None
+      return Number(int(self.value == other.value)), None
     else:
       return None, Value.illegal_operation(self, other)
 
   def get_comparison_ne(self, other):
     if isinstance(other, Number):
-      return Number(int(self.value != other.value)).set_context(self.context), None
+      return Number(int(self.value != other.value)), None
     else:
       return None, Value.illegal_operation(self, other)
 
@@ -199,13 +174,14 @@ class String(Value):
 
   def added_to(self, other):
     if isinstance(other, String):
-      return String(self.value + other.value).set_context(self.context), None
+      return String(self.value + other.value), None
     else:
       return None, Value.illegal_operation(self, other)
 
   def multed_by(self, other):
-    if isinstance(other, Number):
-      return String(self.value * other.value).set_context(self.context), None
+    count = index(other.value) if isinstance(other, Number) else None
+    if count is not None:
+      return String(self.value * count), None
     else:
       return None, Value.illegal_operation(self, other)
 
@@ -230,16 +206,14 @@ class List(Value):
     self.elements = elements
 
   def added_to(self, other):
-    new_list = self.copy()
-    new_list.elements.append(other)
-    return new_list, None
+    return List(self.elements + [other]), None
 
   def subbed_by(self, other):
     if isinstance(other, Number):
-      new_list = self.copy()
+      elements = list(self.elements)
       try:
-        new_list.elements.pop(other.value)
-        return new_list, None
+        elements.pop(index(other.value))
+        return List(elements), None
       except:
         return None, RTError(
           other.pos_start, other.pos_end,
@@ -251,16 +225,14 @@ class List(Value):
 
   def multed_by(self, other):
     if isinstance(other, List):
-      new_list = self.copy()
-      new_list.elements.extend(other.elements)
-      return new_list, None
+      return List(self.elements + other.elements), None
     else:
       return None, Value.illegal_operation(self, other)
 
   def dived_by(self, other):
     if isinstance(other, Number):
       try:
-        return self.elements[other.value], None
+        return self.elements[index(other.value)], None
       except:
         return None, RTError(
           other.pos_start, other.pos_end,
@@ -278,10 +250,17 @@ class List(Value):
     return copy
 
   def __str__(self):
-    return ", ".join([str(x) for x in self.elements])
+    return walk(self, lambda value: value.elements_text('{}') if isinstance(value, List) else str(value))
 
   def __repr__(self):
-    return f'[{", ".join([repr(x) for x in self.elements])}]'
+    return walk(self, lambda value: value.elements_text('[{}]') if isinstance(value, List) else repr(value))
+
+  def elements_text(self, template):
+    # Elements are formatted through walk, so lists nested to any depth print
+    texts = []
+    for element in self.elements:
+      texts.append((yield element))
+    return template.format(", ".join(texts))
 
 class BaseFunction(Value):
   def __init__(self, name):
@@ -294,37 +273,29 @@ class BaseFunction(Value):
     return new_context
 
   def check_args(self, arg_names, args):
-    res = RTResult()
-
     if len(args) > len(arg_names):
-      return res.failure(RTError(
+      raise RTError(
         self.pos_start, self.pos_end,
         f"{len(args) - len(arg_names)} too many args passed into {self}",
         self.context
-      ))
+      )
     
     if len(args) < len(arg_names):
-      return res.failure(RTError(
+      raise RTError(
         self.pos_start, self.pos_end,
         f"{len(arg_names) - len(args)} too few args passed into {self}",
         self.context
-      ))
-
-    return res.success(None)
+      )
 
   def populate_args(self, arg_names, args, exec_ctx):
     for i in range(len(args)):
       arg_name = arg_names[i]
       arg_value = args[i]
-      arg_value.set_context(exec_ctx)
       exec_ctx.symbol_table.set(arg_name, arg_value)
 
   def check_and_populate_args(self, arg_names, args, exec_ctx):
-    res = RTResult()
-    res.register(self.check_args(arg_names, args))
-    if res.should_return(): return res
+    self.check_args(arg_names, args)
     self.populate_args(arg_names, args, exec_ctx)
-    return res.success(None)
 
 class Function(BaseFunction):
   def __init__(self, name, body_node, arg_names, should_auto_return):
@@ -333,19 +304,15 @@ class Function(BaseFunction):
     self.arg_names = arg_names
     self.should_auto_return = should_auto_return
 
-  def execute(self, args):
-    res = RTResult()
+  def execute(self, args, context, pos_start, pos_end):
+    function = self.copy().set_pos(pos_start, pos_end).set_context(context)
     interpreter = Interpreter()
-    exec_ctx = self.generate_new_context()
+    exec_ctx = function.generate_new_context()
 
-    res.register(self.check_and_populate_args(self.arg_names, args, exec_ctx))
-    if res.should_return(): return res
+    function.check_and_populate_args(self.arg_names, args, exec_ctx)
+    value = interpreter.visit(self.body_node, exec_ctx)
 
-    value = res.register(interpreter.visit(self.body_node, exec_ctx))
-    if res.should_return() and res.func_return_value == None: return res
-
-    ret_value = (value if self.should_auto_return else None) or res.func_return_value or Number.null
-    return res.success(ret_value)
+    return (value if self.should_auto_return else None) or Number.null
 
   def copy(self):
     copy = Function(self.name, self.body_node, self.arg_names, self.should_auto_return)
@@ -356,29 +323,89 @@ class Function(BaseFunction):
   def __repr__(self):
     return f"<function {self.name}>"
 
+# BUILTINS
+# Each builtin is an execute_<name> method taking the calling context and
+# its arguments positionally. It is registered with the names of those
+# arguments, which fix its arity, and whether it is pure:
+#
+#   @builtin('value', pure=True)
+#   def execute_abs(self, context, value): ...
+#
+# A builtin that fails raises BuiltinError with the details, and the call
+# turns it into an RTError in a traceback frame of the builtin's own. Only
+# a builtin that runs code of its own (DRAW) is given that frame to run in.
+builtins = {}
+
+def builtin(*arg_names, pure=False, frame=False):
+  def register(method):
+    method.arg_names = list(arg_names)
+    method.pure = pure
+    method.frame = frame
+    builtins[method.__name__[len('execute_'):]] = method
+    return method
+  return register
+
+class BuiltinError(Exception):
+  def __init__(self, details):
+    super().__init__(details)
+    self.details = details
+
 class BuiltInFunction(BaseFunction):
+  # An LRUCache of results by argument values, set by memoize
+  memo = None
+
   def __init__(self, name):
     super().__init__(name)
+    self.method = builtins.get(name)
 
-  def execute(self, args):
-    res = RTResult()
-    exec_ctx = self.generate_new_context()
+  def execute(self, args, context, pos_start, pos_end):
+    method = self.method
+    if method is None: self.no_visit_method(None, context)
 
-    method_name = f'execute_{self.name}'
-    method = getattr(self, method_name, self.no_visit_method)
+    # Builtins report arity errors at self, placed at the call
+    if len(args) != len(method.arg_names):
+      self.copy().set_pos(pos_start, pos_end).set_context(context).check_args(method.arg_names, args)
 
-    res.register(self.check_and_populate_args(method.arg_names, args, exec_ctx))
-    if res.should_return(): return res
+    return self.call(context, pos_start, pos_end, *args)
 
-    return_value = res.register(method(exec_ctx))
-    if res.should_return(): return res
-    return res.success(return_value)
+  def accepts(self, count):
+    return self.method is not None and count == len(self.method.arg_names)
+
+  def call(self, context, pos_start, pos_end, *args):
+    # The direct call, for a call site that has already checked its number
+    # of arguments against accepts
+    memo = self.memo
+    if memo is not None:
+      key = memo_key(args, context.numeric)
+      value = memo.get(key) if key is not None else None
+      if value is not None: return value
+
+    method = self.method
+    try:
+      if method.frame:
+        value = method(self, self.frame(context, pos_start), *args)
+      else:
+        value = method(self, context, *args)
+    except BuiltinError as error:
+      raise RTError(pos_start, pos_end, error.details, self.frame(context, pos_start))
+
+    if memo is not None and key is not None: memo.set(key, value)
+    return value
+
+  def frame(self, context, pos_start):
+    frame = Context(self.name, context, pos_start)
+    frame.symbol_table = context.symbol_table
+    return frame
+
+  def is_pure(self):
+    return getattr(self.method, 'pure', False)
   
   def no_visit_method(self, node, context):
     raise Exception(f'No execute_{self.name} method defined')
 
   def copy(self):
     copy = BuiltInFunction(self.name)
+    copy.memo = self.memo
     copy.set_context(self.context)
     copy.set_pos(self.pos_start, self.pos_end)
     return copy
@@ -387,33 +414,56 @@ class BuiltInFunction(BaseFunction):
     return f"<built-in function {self.name}>"
 
   #####################################
-  def execute_draw(self, exec_ctx):
-    x_1 = exec_ctx.symbol_table.get('x1')
-    x_2 = exec_ctx.symbol_table.get('x2')
-    exp = String(exec_ctx.symbol_table.get('exp'))
-    print(eval(exp.to_str()))
-    draw_exp(inputx=[x_1.to_realnum(),x_2.to_realnum()],inputy=eval(exp.to_str()))
-    return RTResult().success(Number.null)
-  execute_draw.arg_names = ['x1','x2','exp']
-
-  def execute_print(self, exec_ctx):
-    print(str(exec_ctx.symbol_table.get('value')))
-    return RTResult().success(Number.null)
-  execute_print.arg_names = ['value']
+  @builtin('x1', 'x2', 'exp', frame=True)
+  def execute_draw(self, context, x_1, x_2, exp):
+    # Plotting pulls in NumPy and matplotlib, so only once something draws
+    from vector import evaluate
+    import draw
+
+    if not isinstance(x_1, Number) or not isinstance(x_2, Number):
+      raise BuiltinError("DRAW : Range must be an Integer, Float")
+
+    if not isinstance(exp, String):
+      raise BuiltinError("DRAW : Expression must be string")
+
+    # The expression is a program in x, run over a whole grid of x at once;
+    # points where it isn't defined come back as NaN and are left out
+    node, error = parse('<draw>', exp.value)
+    if error:
+      raise BuiltinError("DRAW : Failed to parse expression\n" + error.as_string())
+
+    def function(x):
+      y, error = evaluate(node, context, {'x': x}, strict=False)
+      if error: raise error
+      return y
+
+    try:
+      x, y, ylim = draw.sample(function, x_1.to_realnum(), x_2.to_realnum())
+    except RTError as error:
+      raise BuiltinError("DRAW : Failed to evaluate expression\n" + error.as_string())
+
+    draw.draw_exp(x, y, ylim)
+    return Number.null
+
+  @builtin('value')
+  def execute_print(self, context, value):
+    print(str(value))
+    return Number.null
   
-  def execute_print_ret(self, exec_ctx):
-    return RTResult().success(String(str(exec_ctx.symbol_table.get('value'))))
-  execute_print_ret.arg_names = ['value']
+  @builtin('value', pure=True)
+  def execute_print_ret(self, context, value):
+    return String(str(value))
   
-  def execute_input(self, exec_ctx):
-    if exec_ctx.symbol_table.get('help'):
-      text = input(String(str(exec_ctx.symbol_table.get('help')) + " "))
+  @builtin('help')
+  def execute_input(self, context, help):
+    if help:
+      text = input(String(str(help) + " "))
     else:
       text = input()
-    return RTResult().success(String(text))
-  execute_input.arg_names = ['help']
+    return String(text)
 
-  def execute_input_int(self, exec_ctx):
+  @builtin()
+  def execute_input_int(self, context):
     while True:
       text = input()
       try:
@@ -421,252 +471,152 @@ class BuiltInFunction(BaseFunction):
         break
       except ValueError:
         print(f"'{text}' must be an integer. Try again!")
-    return RTResult().success(Number(number))
-  execute_input_int.arg_names = []
-
-  def execute_abs(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.integer(number))
 
+  @builtin('value', pure=True)
+  def execute_abs(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "ABS : Argument must be an Integer, Float",
-        exec_ctx
-      ))
+      raise BuiltinError("ABS : Argument must be an Integer, Float")
 
-    return RTResult().success(Number(abs(num.to_realnum())))
-  execute_abs.arg_names = ["value"]
-
-  def execute_flr(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.abs(num.value))
 
+  @builtin('value', pure=True)
+  def execute_flr(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "FLR : Argument must be an Integer, Float",
-        exec_ctx
-      ))
-
-    return RTResult().success(Number(math.floor(num.to_realnum())))
-  execute_flr.arg_names = ["value"]
+      raise BuiltinError("FLR : Argument must be an Integer, Float")
 
-  def execute_ceil(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.floor(num.value))
 
+  @builtin('value', pure=True)
+  def execute_ceil(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "CEIL : Argument must be an Integer, Float",
-        exec_ctx
-      ))
+      raise BuiltinError("CEIL : Argument must be an Integer, Float")
 
-    return RTResult().success(Number(math.ceil(num.to_realnum())))
-  execute_ceil.arg_names = ["value"]
-
-  def execute_log(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.ceil(num.value))
 
+  @builtin('value', pure=True)
+  def execute_log(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "LOG : Argument must be an Integer, Float",
-        exec_ctx
-      ))
+      raise BuiltinError("LOG : Argument must be an Integer, Float")
       
     try:
-      math.log10(num.to_realnum())
+      return Number(context.numeric.log(num.value))
     except ValueError:
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "LOG : Out of domain.",
-        exec_ctx
-      ))
-
-    if num.to_realnum() == 0:
-      return RTResult().success(Number(- math.inf))
-    elif math.log10(num.to_realnum()) % 1:
-      return RTResult().success(Number(round(math.log10(num.to_realnum()),2)))
-    else:
-      return RTResult().success(Number(int(math.log10(num.to_realnum()))))
-  execute_log.arg_names = ["value"]
-
-  def execute_sqrt(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+      raise BuiltinError("LOG : Out of domain.")
 
+  @builtin('value', pure=True)
+  def execute_sqrt(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "SQRT : Argument must be an Integer, Float",
-        exec_ctx
-      ))
+      raise BuiltinError("SQRT : Argument must be an Integer, Float")
 
     try:
-      square = math.sqrt(num.to_realnum())
+      square = context.numeric.sqrt(num.value)
     except:
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "SQRT : Argument must be an Integer, Float",
-        exec_ctx
-      ))
-
-    if square % 1:
-      return RTResult().success(String('SQRT(%s)' % round(num.to_realnum(),2)))
-    else:
-      return RTResult().success(Number(int(square)))
-  execute_sqrt.arg_names = ["value"]
+      raise BuiltinError("SQRT : Argument must be an Integer, Float")
 
-  def execute_sin(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    # A root that can't be given exactly comes back symbolic, as a string
+    if isinstance(square, str):
+      return String(square)
+    else:
+      return Number(square)
 
+  @builtin('value', pure=True)
+  def execute_sin(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "SIN : Argument must be an Integer",
-        exec_ctx
-      ))
-
-    return RTResult().success(Number(round(math.sin(math.radians(num.to_realnum())),2)))
-  execute_sin.arg_names = ["value"]
+      raise BuiltinError("SIN : Argument must be an Integer")
 
-  def execute_cos(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.sin(num.value))
 
+  @builtin('value', pure=True)
+  def execute_cos(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "COS : Argument must be an Integer",
-        exec_ctx
-      ))
+      raise BuiltinError("COS : Argument must be an Integer")
 
-    return RTResult().success(Number(round(math.cos(math.radians(num.to_realnum())),2)))
-  execute_cos.arg_names = ["value"]
-
-  def execute_cot(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.cos(num.value))
 
+  @builtin('value', pure=True)
+  def execute_cot(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "COT : Argument must be an Integer",
-        exec_ctx
-      ))
-
-    return RTResult().success(Number(round((1/math.tan(math.radians(num.to_realnum()))),2)))
-  execute_cot.arg_names = ["value"]
+      raise BuiltinError("COT : Argument must be an Integer")
 
-  def execute_tan(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.cot(num.value))
 
+  @builtin('value', pure=True)
+  def execute_tan(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "TAN : Argument must be an Integer",
-        exec_ctx
-      ))
+      raise BuiltinError("TAN : Argument must be an Integer")
 
-    return RTResult().success(Number(round(math.tan(math.radians(num.to_realnum())),2)))
-  execute_tan.arg_names = ["value"]
-
-  def execute_asin(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.tan(num.value))
 
+  @builtin('value', pure=True)
+  def execute_asin(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "ASIN : Argument must be an Integer",
-        exec_ctx
-      ))
-
-    return RTResult().success(Number(round(math.asin(math.radians(num.to_realnum())),2)))
-  execute_asin.arg_names = ["value"]
+      raise BuiltinError("ASIN : Argument must be an Integer")
 
-  def execute_acos(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.asin(num.value))
 
+  @builtin('value', pure=True)
+  def execute_acos(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "ACOS : Argument must be an Integer",
-        exec_ctx
-      ))
-
-    return RTResult().success(Number(round(math.acos(math.radians(num.to_realnum())),2)))
-  execute_acos.arg_names = ["value"]
+      raise BuiltinError("ACOS : Argument must be an Integer")
 
-  def execute_acot(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.acos(num.value))
 
+  @builtin('value', pure=True)
+  def execute_acot(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "ACOT : Argument must be an Integer",
-        exec_ctx
-      ))
+      raise BuiltinError("ACOT : Argument must be an Integer")
 
-    return RTResult().success(Number(round((math.pi/2) - math.atan(math.radians(num.to_realnum())),2)))
-  execute_acot.arg_names = ["value"]
-
-  def execute_atan(self, exec_ctx):
-    num = exec_ctx.symbol_table.get("value")
+    return Number(context.numeric.acot(num.value))
 
+  @builtin('value', pure=True)
+  def execute_atan(self, context, num):
     if not isinstance(num, Number):
-      return RTResult().failure(RTError(
-        self.pos_start,self.pos_end,
-        "ATAN : Argument must be an Integer",
-        exec_ctx
-      ))
-
-    return RTResult().success(Number(round(math.atan(math.radians(num.to_realnum())),2)))
-  execute_atan.arg_names = ["value"]
+      raise BuiltinError("ATAN : Argument must be an Integer")
 
-  def execute_len(self, exec_ctx):
-    list_ = exec_ctx.symbol_table.get("list")
+    return Number(context.numeric.atan(num.value))
 
+  @builtin('list', pure=True)
+  def execute_len(self, context, list_):
     if not isinstance(list_, List):
-      return RTResult().failure(RTError(
-        self.pos_start, self.pos_end,
-        "Argument must be list",
-        exec_ctx
-      ))
-
-    return RTResult().success(Number(len(list_.elements)))
-  execute_len.arg_names = ["list"]
+      raise BuiltinError("Argument must be list")
 
-  def execute_run(self, exec_ctx):
-    fn = exec_ctx.symbol_table.get("fn")
+    return Number(context.numeric.integer(len(list_.elements)))
 
+  @builtin('fn')
+  def execute_run(self, context, fn):
     if not isinstance(fn, String):
-      return RTResult().failure(RTError(
-        self.pos_start, self.pos_end,
-        "Second argument must be string",
-        exec_ctx
-      ))
+      raise BuiltinError("Second argument must be string")
 
     fn = fn.value
 
+    # The script runs in the caller's session, whose table is at the root of
+    # the context chain, a statement at a time straight out of a mapping of
+    # the file
+    root = context
+    while root.parent: root = root.parent
+    error = None
+
     try:
-      with open(fn, "r") as f:
-        script = f.read()
-    except Exception as e:
-      return RTResult().failure(RTError(
-        self.pos_start, self.pos_end,
-        f"Failed to load script \"{fn}\"\n" + str(e),
-        exec_ctx
-      ))
+      results = run_file(fn, Session(root.symbol_table, context.numeric))
+    except (OSError, UnicodeDecodeError) as e:
+      raise BuiltinError(f"Failed to load script \"{fn}\"\n" + str(e))
+
+    # The file is lexed as it runs, so text that isn't UTF-8 can only turn up
+    # on the way; anything else raised while running isn't about loading it
+    try:
+      for _, error in results:
+        pass
+    except UnicodeDecodeError as e:
+      raise BuiltinError(f"Failed to load script \"{fn}\"\n" + str(e))
 
-    _, error = run(fn, script)
-    
     if error:
-      return RTResult().failure(RTError(
-        self.pos_start, self.pos_end,
+      raise BuiltinError(
         f"Failed to finish executing script \"{fn}\"\n" +
-        error.as_string(),
-        exec_ctx
-      ))
-
-    return RTResult().success(Number.null)
-  execute_run.arg_names = ["fn"]
+        error.as_string()
+      )
 
+    return Number.null
 
 BuiltInFunction.abs         = BuiltInFunction("abs")
 BuiltInFunction.flr         = BuiltInFunction("flr")
@@ -689,11 +639,23 @@ BuiltInFunction.input_int   = BuiltInFunction("input_int")
 BuiltInFunction.run					= BuiltInFunction("run")
 
 # INTERPRETER
+# Visits that need their children's results are generators yielding each
+# child, run by walk, so deep nesting needs no Python stack
 class Interpreter:
+  def __init__(self):
+    # Inline caches by node, see visit_BinOpNode
+    self.caches = {}
+
   def visit(self, node, context):
-    method_name = f'visit_{type(node).__name__}'
-    method = getattr(self, method_name, self.no_visit_method)
-    return method(node, context)
+    methods = {}
+
+    def visit_node(node):
+      method = methods.get(type(node))
+      if method is None:
+        method_name = f'visit_{type(node).__name__}'
+        method = methods[type(node)] = getattr(self, method_name, self.no_visit_method)
+      return method(node, context)
+    return walk(node, visit_node)
 
   def no_visit_method(self, node, context):
     raise Exception(f'No visit_{type(node).__name__} method defined')
@@ -701,175 +663,692 @@ class Interpreter:
   ###################################
 
   def visit_NumberNode(self, node, context):
-    return RTResult().success(
-      Number(node.tok.value).set_context(context).set_pos(node.pos_start, node.pos_end)
-    )
+    return Number(node.tok.value)
 
   def visit_StringNode(self, node, context):
-    return RTResult().success(
-      String(node.tok.value).set_context(context).set_pos(node.pos_start, node.pos_end)
-    )
+    return String(node.tok.value)
 
   def visit_ListNode(self, node, context):
-    res = RTResult()
     elements = []
 
     for element_node in node.element_nodes:
-      elements.append(res.register(self.visit(element_node, context)))
-      if res.should_return(): return res
+      elements.append((yield element_node))
 
-    return res.success(
-      List(elements).set_context(context).set_pos(node.pos_start, node.pos_end)
-    )
+    return List(elements)
 
   def visit_VarAccessNode(self, node, context):
-    res = RTResult()
     var_name = node.var_name_tok.value
     value = context.symbol_table.get(var_name)
 
     if var_name == 'x' and not value:
-      return res.failure(RTError(
+      raise RTError(
               node.pos_start, node.pos_end,
               f"'{var_name}' is wtf",
               context
-            ))
+            )
 
     if not value:
-      return res.failure(RTError(
+      raise RTError(
         node.pos_start, node.pos_end,
         f"'{var_name}' is not defined",
         context
-      ))
+      )
 
-    value = value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
-    return res.success(value)
+    return value
 
   def visit_VarAssignNode(self, node, context):
-    res = RTResult()
     var_name = node.var_name_tok.value
-    value = res.register(self.visit(node.value_node, context))
-    if res.should_return(): return res
+    value = yield node.value_node
 
     context.symbol_table.set(var_name, value)
-    return res.success(value)
+    return value
 
   def visit_BinOpNode(self, node, context):
-    res = RTResult()
-    left = res.register(self.visit(node.left_node, context))
-    if res.should_return(): return res
-    right = res.register(self.visit(node.right_node, context))
-    if res.should_return(): return res
-
-    if node.op_tok.type == TT_PLUS:
-      result, error = left.added_to(right)
-    elif node.op_tok.type == TT_MINUS:
-      result, error = left.subbed_by(right)
-    elif node.op_tok.type == TT_MUL:
-      result, error = left.multed_by(right)
-    elif node.op_tok.type == TT_DIV:
-      result, error = left.dived_by(right)
-    elif node.op_tok.type == TT_MOD:
-      result, error = left.moded_by(right)
-    elif node.op_tok.type == TT_POW:
-      result, error = left.powed_by(right)
-    elif node.op_tok.type == TT_EE:
-      result, error = left.get_comparison_eq(right)
-    elif node.op_tok.type == TT_NE:
-      result, error = left.get_comparison_ne(right)
-    elif node.op_tok.type == TT_LT:
-      result, error = left.get_comparison_lt(right)
-    elif node.op_tok.type == TT_GT:
-      result, error = left.get_comparison_gt(right)
-    elif node.op_tok.type == TT_LTE:
-      result, error = left.get_comparison_lte(right)
-    elif node.op_tok.type == TT_GTE:
-      result, error = left.get_comparison_gte(right)
-    elif node.op_tok.matches(TT_KEYWORD, 'AND'):
-      result, error = left.anded_by(right)
-    elif node.op_tok.matches(TT_KEYWORD, 'OR'):
-      result, error = left.ored_by(right)
-
+    left = yield node.left_node
+    right = yield node.right_node
+
+    # A node's inline cache holds the operand types it saw last with the
+    # operation specialized for them, so a hit skips the dispatch entirely.
+    # It's kept by the interpreter, as the node itself is shared between
+    # sessions and threads once it's in the parse or program cache
+    cache = self.caches.get(node)
+    if cache is None or cache[0] is not type(left) or cache[1] is not type(right):
+      cache = self.caches[node] = specialize(node.op_tok, type(left), type(right))
+
+    fast = cache[2]
+    if fast:
+      result = fast(left, right)
+      if result is not None: return result
+
+    result, error = getattr(left, cache[3])(right)
     if error:
-      return res.failure(error)
-    else:
-      return res.success(result.set_pos(node.pos_start, node.pos_end))
+      raise operation_error(cache[3], left, node.left_node, right, node.right_node, context)
 
-  def visit_UnaryOpNode(self, node, context):
-    res = RTResult()
-    number = res.register(self.visit(node.node, context))
-    if res.should_return(): return res
+    return result
 
-    error = None
+  def visit_UnaryOpNode(self, node, context):
+    number = yield node.node
 
     if node.op_tok.type == TT_MINUS:
-      number, error = number.multed_by(Number(-1))
+      result, error = number.multed_by(Number(-1))
+      if error:
+        _, error = positioned(number, node.node, context).multed_by(Number(-1))
+        raise error
+      return result
     elif node.op_tok.matches(TT_KEYWORD, 'NOT'):
-      number, error = number.notted()
+      return number.notted()
 
-    if error:
-      return res.failure(error)
-    else:
-      return res.success(number.set_pos(node.pos_start, node.pos_end))
+    return number
 
   def visit_CallNode(self, node, context):
-    res = RTResult()
     args = []
 
-    value_to_call = res.register(self.visit(node.node_to_call, context))
-    if res.should_return(): return res
-    value_to_call = value_to_call.copy().set_pos(node.pos_start, node.pos_end)
+    value_to_call = yield node.node_to_call
+
+    for arg_node in node.arg_nodes:
+      args.append((yield arg_node))
+
+    return value_to_call.execute(args, context, node.pos_start, node.pos_end)
+
+# OPERATIONS
+# The Value method each binary operator calls
+bin_op_methods = {
+  TT_PLUS: 'added_to',
+  TT_MINUS: 'subbed_by',
+  TT_MUL: 'multed_by',
+  TT_DIV: 'dived_by',
+  TT_MOD: 'moded_by',
+  TT_POW: 'powed_by',
+  TT_EE: 'get_comparison_eq',
+  TT_NE: 'get_comparison_ne',
+  TT_LT: 'get_comparison_lt',
+  TT_GT: 'get_comparison_gt',
+  TT_LTE: 'get_comparison_lte',
+  TT_GTE: 'get_comparison_gte',
+  'AND': 'anded_by',
+  'OR': 'ored_by',
+}
+
+def operator_method(op_tok):
+  return bin_op_methods[op_tok.value if op_tok.type == TT_KEYWORD else op_tok.type]
+
+# Number with Number, by far the most common case, computed straight on the
+# values as an expression in {0} and {1}. Where the method can fail there is
+# also a condition under which it can't; otherwise the method runs and
+# builds the error.
+number_operations = {
+  'added_to': ('{0} + {1}', None),
+  'subbed_by': ('{0} - {1}', None),
+  'multed_by': ('{0} * {1}', None),
+  'dived_by': ('{0} / {1}', '{1}'),
+  'moded_by': ('{0} % {1}', '{1}'),
+  'powed_by': ('{0} ** {1}', None),
+  'get_comparison_eq': ('int({0} == {1})', None),
+  'get_comparison_ne': ('int({0} != {1})', None),
+}
+
+def number_operation(method_name):
+  # A function of two Numbers returning the result, or None where the method
+  # has to run instead
+  expression, condition = number_operations[method_name]
+  source = f'Number({expression.format("left.value", "right.value")})'
+  if condition: source += f' if {condition.format("left.value", "right.value")} else None'
+  return eval(f'lambda left, right: {source}', {'Number': Number})
+
+number_functions = {method_name: number_operation(method_name) for method_name in number_operations}
+
+def specialize(op_tok, left_type, right_type):
+  # An inline cache entry: the operand types, the fast function for them if
+  # there is one, and the method that handles everything else
+  method_name = operator_method(op_tok)
+  fast = number_functions.get(method_name) if left_type is Number and right_type is Number else None
+  return left_type, right_type, fast, method_name
+
+def positioned(value, node, context):
+  # Place a copy of value where node produced it; an assignment hands on the
+  # value of its right-hand side unchanged
+  while isinstance(node, VarAssignNode):
+    node = node.value_node
+  return value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
+
+def operation_error(method_name, left, left_node, right, right_node, context):
+  left = positioned(left, left_node, context)
+  if right_node: right = positioned(right, right_node, context)
+  _, error = getattr(left, method_name)(right)
+  return error
+
+# COMPILER
+# Turns an AST into one straight-line Python function, program(context),
+# that returns or raises exactly like Interpreter.visit would.
+class Compiler:
+  def __init__(self, builtins=None):
+    # Builtins by name that the guards promise are still bound, called
+    # directly instead of looked up and executed
+    self.builtins = builtins or {}
+    self.lines = []
+    self.constants = {}
+    self.temp_count = 0
+
+  def compile(self, node, guards=None, fallback=None):
+    # Guards are names the program was specialized on; if any of them has been
+    # rebound since, the unspecialized fallback program runs instead
+    for var_name, value in (guards or {}).items():
+      self.lines.append(
+        f'if lookup({var_name!r}) is not {self.constant(value)}: '
+        f'return {self.constant(fallback)}(context)'
+      )
+
+    result = walk(node, self.emit)
+    # The table's accessors are bound once per run
+    source = 'def program(context):\n'
+    source += '  lookup = context.symbol_table.lookup\n'
+    source += '  set_name = context.symbol_table.set\n'
+    source += ''.join(f'  {line}\n' for line in self.lines)
+    source += f'  return {result}\n'
+
+    namespace = dict(self.constants, Number=Number, List=List, RTError=RTError, operation_error=operation_error)
+    exec(compile(source, '<compiled>', 'exec'), namespace)
+    return namespace['program']
+
+  def emit(self, node):
+    method_name = f'emit_{type(node).__name__}'
+    method = getattr(self, method_name, self.no_emit_method)
+    return method(node)
+
+  def no_emit_method(self, node):
+    raise Exception(f'No emit_{type(node).__name__} method defined')
+
+  def new_temp(self):
+    self.temp_count += 1
+    return f't{self.temp_count}'
+
+  def constant(self, value):
+    name = f'k{len(self.constants)}'
+    self.constants[name] = value
+    return name
+
+  def span(self, node):
+    return f'{self.constant(node.pos_start)}, {self.constant(node.pos_end)}'
+
+  ###################################
+
+  def emit_NumberNode(self, node):
+    return self.constant(Number(node.tok.value))
+
+  def emit_StringNode(self, node):
+    return self.constant(String(node.tok.value))
 
+  def emit_ListNode(self, node):
+    elements = []
+    for element_node in node.element_nodes:
+      elements.append((yield element_node))
+    temp = self.new_temp()
+    self.lines.append(f'{temp} = List([{", ".join(elements)}])')
+    return temp
+
+  def emit_VarAccessNode(self, node):
+    var_name = node.var_name_tok.value
+    details = f"'{var_name}' is wtf" if var_name == 'x' else f"'{var_name}' is not defined"
+    temp = self.new_temp()
+    self.lines += [
+      f'{temp} = lookup({var_name!r})',
+      f'if not {temp}: raise RTError({self.span(node)}, {self.constant(details)}, context)',
+    ]
+    return temp
+
+  def emit_VarAssignNode(self, node):
+    value = yield node.value_node
+    self.lines.append(f'set_name({node.var_name_tok.value!r}, {value})')
+    return value
+
+  def emit_BinOpNode(self, node):
+    left = yield node.left_node
+    right = yield node.right_node
+    method_name = operator_method(node.op_tok)
+    temp = self.new_temp()
+    generic = [
+      f'{temp}, error = {left}.{method_name}({right})',
+      f'if error: raise operation_error({self.constant(method_name)}, '
+      f'{left}, {self.constant(node.left_node)}, {right}, {self.constant(node.right_node)}, context)',
+    ]
+    if method_name not in number_operations:
+      self.lines += generic
+      return temp
+
+    # Two Numbers take the inline fast path, anything else the method
+    expression, condition = number_operations[method_name]
+    values = f'{left}.value', f'{right}.value'
+    test = f'type({left}) is Number and type({right}) is Number'
+    if condition: test += f' and {condition.format(*values)}'
+    self.lines += [
+      f'if {test}: {temp} = Number({expression.format(*values)})',
+      'else:',
+      *(f'  {line}' for line in generic),
+    ]
+    return temp
+
+  def emit_UnaryOpNode(self, node):
+    number = yield node.node
+    temp = self.new_temp()
+
+    if node.op_tok.type == TT_MINUS:
+      minus_one = self.constant(Number(-1))
+      self.lines += [
+        f'{temp}, error = {number}.multed_by({minus_one})',
+        f'if error: raise operation_error(\'multed_by\', '
+        f'{number}, {self.constant(node.node)}, {minus_one}, None, context)',
+      ]
+    elif node.op_tok.matches(TT_KEYWORD, 'NOT'):
+      self.lines.append(f'{temp} = {number}.notted()')
+    else:
+      return number
+
+    return temp
+
+  def emit_CallNode(self, node):
+    callee = node.node_to_call
+    function = self.builtins.get(callee.var_name_tok.value) if isinstance(callee, VarAccessNode) else None
+    if function and function.accepts(len(node.arg_nodes)):
+      args = []
+      for arg_node in node.arg_nodes:
+        args.append((yield arg_node))
+      temp = self.new_temp()
+      self.lines.append(f'{temp} = {self.constant(function)}.call(context, {self.span(node)}{"".join(f", {arg}" for arg in args)})')
+      return temp
+
+    value_to_call = yield callee
+    args = []
     for arg_node in node.arg_nodes:
-      args.append(res.register(self.visit(arg_node, context)))
-      if res.should_return(): return res
+      args.append((yield arg_node))
+    temp = self.new_temp()
+    self.lines.append(f'{temp} = {value_to_call}.execute([{", ".join(args)}], context, {self.span(node)})')
+    return temp
+
+# OPTIMIZER
+# Folds constant subtrees into NumberNodes spanning the original source, so
+# values and runtime errors keep pointing at the text that produced them.
+class Optimizer:
+  constants = {
+    'MATH_PI': Number.math_PI,
+    'MATH_E': Number.math_E,
+  }
+
+  pure_functions = {
+    'ABS': BuiltInFunction.abs,
+    'FLR': BuiltInFunction.flr,
+    'CEIL': BuiltInFunction.ceil,
+    'LOG': BuiltInFunction.log,
+    'SQRT': BuiltInFunction.sqrt,
+    'SIN': BuiltInFunction.sin,
+    'COS': BuiltInFunction.cos,
+    'COT': BuiltInFunction.cot,
+    'TAN': BuiltInFunction.tan,
+    'ASIN': BuiltInFunction.asin,
+    'ACOS': BuiltInFunction.acos,
+    'ACOT': BuiltInFunction.acot,
+    'ATAN': BuiltInFunction.atan,
+  }
+
+  max_power_bits = 4096
+
+  def __init__(self, constants=None):
+    if constants is not None: self.constants = constants
+    # Global names the optimized tree relies on, checked by the compiled guard
+    self.assumptions = {}
+    self.called_functions = {}
+
+  def optimize(self, node):
+    # Constants can only be trusted if nothing in the program can rebind them
+    self.assigned_names = set()
+    self.can_fold_constants = self.is_foldable_program(node)
+    return walk(node, self.visit)
+
+  def is_foldable_program(self, node):
+    # Every node has to pass, so the tree is checked off a stack in any order
+    nodes = [node]
+    while nodes:
+      node = nodes.pop()
+      if isinstance(node, VarAssignNode):
+        self.assigned_names.add(node.var_name_tok.value)
+        nodes.append(node.value_node)
+      elif isinstance(node, CallNode):
+        callee = node.node_to_call
+        if not isinstance(callee, VarAccessNode) or callee.var_name_tok.value not in self.pure_functions:
+          return False
+        self.called_functions[callee.var_name_tok.value] = self.pure_functions[callee.var_name_tok.value]
+        nodes.extend(node.arg_nodes)
+      elif isinstance(node, ListNode):
+        nodes.extend(node.element_nodes)
+      elif isinstance(node, BinOpNode):
+        nodes += (node.left_node, node.right_node)
+      elif isinstance(node, UnaryOpNode):
+        nodes.append(node.node)
+    return True
+
+  def visit(self, node):
+    method_name = f'visit_{type(node).__name__}'
+    method = getattr(self, method_name, self.no_visit_method)
+    return method(node)
+
+  def no_visit_method(self, node):
+    return node
+
+  def number_node(self, value, node):
+    source = node.pos_start.source
+    tok_type = TT_INT if isinstance(value, int) else TT_FLOAT
+    return NumberNode(Token(tok_type, value, source, node.pos_start.idx, node.pos_end.idx))
+
+  def is_huge_power(self, base, exponent):
+    # An exact power grows with its exponent (10^10^6 is a million digits), and
+    # folding computes it even if the program never gets that far, so those
+    # are left for the run. Float and decimal powers stay cheap either way
+    if not isinstance(base, (int, Fraction)) or not isinstance(exponent, (int, Fraction)):
+      return False
+    if Fraction(exponent).denominator != 1: return False
+    base = Fraction(base)
+    bits = max(base.numerator.bit_length(), base.denominator.bit_length())
+    return abs(exponent) * bits > self.max_power_bits
 
-    return_value = res.register(value_to_call.execute(args))
-    if res.should_return(): return res
-    return_value = return_value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
-    return res.success(return_value)
+  ###################################
+
+  def visit_ListNode(self, node):
+    element_nodes = []
+    for element_node in node.element_nodes:
+      element_nodes.append((yield element_node))
+    if all([new is old for new, old in zip(element_nodes, node.element_nodes)]): return node
+    return ListNode(element_nodes, node.pos_start, node.pos_end)
+
+  def visit_VarAccessNode(self, node):
+    var_name = node.var_name_tok.value
+    if not self.can_fold_constants or var_name not in self.constants or var_name in self.assigned_names:
+      return node
+
+    self.assumptions[var_name] = self.constants[var_name]
+    self.assumptions.update(self.called_functions)
+    return self.number_node(self.constants[var_name].value, node)
+
+  def visit_VarAssignNode(self, node):
+    value_node = yield node.value_node
+    if value_node is node.value_node: return node
+    return VarAssignNode(node.var_name_tok, value_node)
+
+  def visit_CallNode(self, node):
+    arg_nodes = []
+    for arg_node in node.arg_nodes:
+      arg_nodes.append((yield arg_node))
+    if all([new is old for new, old in zip(arg_nodes, node.arg_nodes)]): return node
+    return CallNode(node.node_to_call, arg_nodes)
+
+  def visit_UnaryOpNode(self, node):
+    operand = yield node.node
+
+    if isinstance(operand, NumberNode):
+      if node.op_tok.type == TT_PLUS:
+        return self.number_node(operand.tok.value, node)
+      if node.op_tok.type == TT_MINUS:
+        return self.number_node(operand.tok.value * -1, node)
+
+    if operand is node.node: return node
+    return UnaryOpNode(node.op_tok, operand)
+
+  def visit_BinOpNode(self, node):
+    left = yield node.left_node
+    right = yield node.right_node
+    op_type = node.op_tok.type
+
+    if isinstance(left, NumberNode) and isinstance(right, NumberNode):
+      method = getattr(Number, bin_op_methods.get(op_type, ''), None)
+      if method and not (op_type == TT_POW and self.is_huge_power(left.tok.value, right.tok.value)):
+        try:
+          result, error = method(Number(left.tok.value), Number(right.tok.value))
+        except ArithmeticError:
+          result, error = None, True
+        if not error:
+          return self.number_node(result.value, node)
+
+    # No identities (x * 1, x - 0, x ^ 1) are applied: a variable's type isn't
+    # known before the run, and for strings and lists '* 1' and '- 0' mean
+    # something else entirely. Operands that are all literals are folded above
+
+    if left is node.left_node and right is node.right_node: return node
+    return BinOpNode(left, node.op_tok, right)
+
+# MEMOIZATION
+# Opt-in caching of pure builtin results by argument values. Values never
+# change once built, so a cached result is shared like any other. Errors
+# aren't cached, since they carry the position of the call that raised them.
+def memo_key(args, numeric=None):
+  # Arguments reduce to nested tuples tagged with their types, so 1 and 1.0
+  # (and 0.0 and -0.0) stay apart, under the backend that computes on them.
+  # Anything else (a function) can't be a key
+  key = []
+  for arg in args:
+    if isinstance(arg, List):
+      elements = memo_key(arg.elements)
+      if elements is None: return None
+      key.append((List, elements))
+    elif isinstance(arg, (Number, String)):
+      value = arg.value
+      if value == 0 and isinstance(value, float): value = (value, math.copysign(1.0, value))
+      key.append((type(arg), type(arg.value), value))
+    else:
+      return None
+  return (numeric,) + tuple(key)
+
+def memoize(function, maxsize=1024):
+  # Returns the builtin's cache, or None when it isn't pure (or maxsize is
+  # 0, which turns memoization back off)
+  if maxsize <= 0 or not function.is_pure():
+    function.memo = None
+    return None
+  if function.memo is None:
+    function.memo = LRUCache(maxsize)
+  else:
+    function.memo.resize(maxsize)
+  return function.memo
+
+def memoize_builtins(maxsize=1024):
+  # Memoizes every pure builtin, skipping PRINT, INPUT, RUN and the like
+  return {
+    function.name: memoize(function, maxsize)
+    for function in builtin_symbol_table.symbols.values()
+    if isinstance(function, BuiltInFunction) and function.is_pure()
+  }
+
+def memo_stats():
+  return {
+    function.name: function.memo.stats()
+    for function in builtin_symbol_table.symbols.values()
+    if isinstance(function, BuiltInFunction) and function.memo is not None
+  }
 
 # RUN
-global_symbol_table = SymbolTable()
-global_symbol_table.set("NULL", Number.null)
-global_symbol_table.set("FALSE", Number.false)
-global_symbol_table.set("TRUE", Number.true)
-global_symbol_table.set("MATH_PI", Number.math_PI)
-global_symbol_table.set("MATH_E", Number.math_E)
-global_symbol_table.set("ABS", BuiltInFunction.abs)
-global_symbol_table.set("FLR", BuiltInFunction.flr)
-global_symbol_table.set("CEIL", BuiltInFunction.ceil)
-global_symbol_table.set("LOG", BuiltInFunction.log)
-global_symbol_table.set("SQRT", BuiltInFunction.sqrt)
-global_symbol_table.set("SIN", BuiltInFunction.sin)
-global_symbol_table.set("COS", BuiltInFunction.cos)
-global_symbol_table.set("COT", BuiltInFunction.cot)
-global_symbol_table.set("TAN", BuiltInFunction.tan)
-global_symbol_table.set("ASIN", BuiltInFunction.asin)
-global_symbol_table.set("ACOS", BuiltInFunction.acos)
-global_symbol_table.set("ACOT", BuiltInFunction.acot)
-global_symbol_table.set("ATAN", BuiltInFunction.atan)
-global_symbol_table.set("DRAW", BuiltInFunction.draw)
-global_symbol_table.set("PRINT", BuiltInFunction.print)
-global_symbol_table.set("PRINT_RET", BuiltInFunction.print_ret)
-global_symbol_table.set("INPUT", BuiltInFunction.input)
-global_symbol_table.set("INPUT_INT", BuiltInFunction.input_int)
-global_symbol_table.set("RUN", BuiltInFunction.run)
-
-def run(fn, text):
+# The names every session starts with, as one frozen table they all share
+builtin_symbol_table = table_of({
+  "NULL": Number.null,
+  "FALSE": Number.false,
+  "TRUE": Number.true,
+  "MATH_PI": Number.math_PI,
+  "MATH_E": Number.math_E,
+  "ABS": BuiltInFunction.abs,
+  "FLR": BuiltInFunction.flr,
+  "CEIL": BuiltInFunction.ceil,
+  "LOG": BuiltInFunction.log,
+  "SQRT": BuiltInFunction.sqrt,
+  "SIN": BuiltInFunction.sin,
+  "COS": BuiltInFunction.cos,
+  "COT": BuiltInFunction.cot,
+  "TAN": BuiltInFunction.tan,
+  "ASIN": BuiltInFunction.asin,
+  "ACOS": BuiltInFunction.acos,
+  "ACOT": BuiltInFunction.acot,
+  "ATAN": BuiltInFunction.atan,
+  "DRAW": BuiltInFunction.draw,
+  "PRINT": BuiltInFunction.print,
+  "PRINT_RET": BuiltInFunction.print_ret,
+  "INPUT": BuiltInFunction.input,
+  "INPUT_INT": BuiltInFunction.input_int,
+  "RUN": BuiltInFunction.run,
+}).frozen()
+
+# SESSIONS
+# A session is one client's names, layered over the read-only builtins that
+# every session shares. Sessions share nothing writable, so each one can be
+# driven from its own thread or task without locks.
+#
+# A session also picks the numeric backend its numbers are computed with:
+# Session(numeric='fraction') or Session(numeric=DecimalBackend(50)).
+class Session:
+  def __init__(self, symbol_table=None, numeric=None):
+    self.numeric = numeric_backend(numeric)
+    if symbol_table is None:
+      symbol_table = SymbolTable(builtin_tables(self.numeric))
+    self.symbol_table = symbol_table
+
+  def new_context(self):
+    context = Context('<program>')
+    context.symbol_table = self.symbol_table
+    context.numeric = self.numeric
+    return context
+
+  def run(self, fn, text):
+    return run(fn, text, self)
+
+# Backends with their own constants get them as Numbers in a frozen table
+# over the builtins, built once per backend
+backend_constants = {}
+backend_tables = {}
+
+def constant_numbers(numeric):
+  constants = backend_constants.get(numeric)
+  if constants is None:
+    constants = {name: Number(value) for name, value in numeric.constants().items()}
+    backend_constants[numeric] = constants
+  return constants
+
+def builtin_tables(numeric):
+  table = backend_tables.get(numeric)
+  if table is None:
+    constants = constant_numbers(numeric)
+    if not constants: return builtin_symbol_table
+    table = backend_tables[numeric] = table_of(constants, builtin_symbol_table).frozen()
+  return table
+
+# Used when no session is given, so names persist between shell lines
+default_session = Session()
+global_symbol_table = default_session.symbol_table
+
+# Parsed and compiled programs never change once built, so they are shared
+# between calls. Tune with parse_cache.resize(n), drop with invalidate().
+parse_cache = LRUCache(256)
+program_cache = LRUCache(256)
+
+def parse(fn, text):
+  node = parse_cache.get((fn, text))
+  if node: return node, None
+
   # Generate tokens
   lexer = Lexer(fn, text)
   tokens, error = lexer.make_tokens()
   if error: return None, error
-  
+
   # Generate AST
   parser = Parser(tokens)
   ast = parser.parse()
   if ast.error: return None, ast.error
 
-  # Run program
-  interpreter = Interpreter()
-  context = Context('<program>')
-  context.symbol_table = global_symbol_table
-  result = interpreter.visit(ast.node, context)
+  parse_cache.set((fn, text), ast.node)
+  return ast.node, None
+
+def compile_text(fn, text, numeric=None):
+  numeric = numeric_backend(numeric)
+  program = program_cache.get((fn, text, numeric))
+  if program: return program, None
+
+  node, error = parse(fn, text)
+  if error: return None, error
+
+  program = compile_node(node, numeric)
+  program_cache.set((fn, text, numeric), program)
+  return program, None
+
+def compile_node(node, numeric=None):
+  # Literals become the backend's numbers first, and folding runs in its
+  # scope so a decimal program folds at the session's precision
+  numeric = numeric_backend(numeric)
+  with numeric.scope():
+    node = convert(node, numeric)
+    optimizer = Optimizer(constant_numbers(numeric) or None)
+    optimized_node = optimizer.optimize(node)
+
+  # When nothing in the program can rebind the builtins it calls, they are
+  # called directly, on the same guards as the folded constants
+  builtins = {
+    name: function for name, function in optimizer.called_functions.items()
+    if optimizer.can_fold_constants and name not in optimizer.assigned_names
+  }
+  guards = dict(optimizer.assumptions, **builtins)
+
+  # The unoptimized program only runs once a guard trips, so it's compiled
+  # then, and not at all when the optimized one relies on no names
+  if not guards: return Compiler().compile(optimized_node)
+  return Compiler(builtins).compile(optimized_node, guards, lazy_program(node))
+
+def lazy_program(node):
+  program = None
+
+  def run(context):
+    nonlocal program
+    if program is None: program = Compiler().compile(node)
+    return program(context)
+  return run
+
+def run(fn, text, session=None):
+  session = session or default_session
+  program, error = compile_text(fn, text, session.numeric)
+  if error: return None, error
+
+  return execute(program, session)
+
+def execute(program, session=None):
+  session = session or default_session
+  context = session.new_context()
+
+  try:
+    with session.numeric.scope():
+      return program(context), None
+  except RTError as error:
+    return None, error
+
+def run_batch(fn, text, bindings, session=None):
+  from vector import evaluate
+
+  session = session or default_session
+  node, error = parse(fn, text)
+  if error: return None, error
+
+  # Run program once over every binding
+  context = session.new_context()
+  # NumPy computes on floats, so another backend's numbers can't be swept
+  if session.numeric is not float_backend:
+    return None, RTError(node.pos_start, node.pos_end, 'Batch evaluation is float-only', context)
+  return evaluate(node, context, bindings)
+
+def run_many(jobs, workers=None, chunksize=None):
+  from parallel import evaluate_many
+
+  # Each job is (fn, text) or (fn, text, bindings); results keep job order
+  return evaluate_many(jobs, workers, chunksize)
+
+def run_stream(fn, f, session=None):
+  from stream import evaluate_stream
+
+  # Yields (value, error) per statement of the file-like f, stopping after
+  # the first error
+  return evaluate_stream(fn, f, session)
+
+def run_file(fn, session=None):
+  from stream import evaluate_file
 
-  return result.value, result.error
+  # Like run_stream, but lexes the file in place through an mmap
+  return evaluate_file(fn, session)
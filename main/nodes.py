@@ -1,3 +1,5 @@
+from types import GeneratorType
+
 class NumberNode:
   def __init__(self, tok):
     self.tok = tok
@@ -90,3 +92,54 @@ class CallNode:
       self.pos_end = self.arg_nodes[len(self.arg_nodes) - 1].pos_end
     else:
       self.pos_end = self.node_to_call.pos_end
+
+# WALKING
+# Visitors that need their children's results are written as generators:
+# they yield a child and get its result back, and walk keeps the pending
+# visits on its own stack. Nesting then costs a list entry instead of Python
+# frames, so any depth of tree that fits in memory can be walked.
+#
+#   def visit_BinOpNode(self, node):
+#     left = yield node.left_node
+#     right = yield node.right_node
+#     return left + right
+#
+# visit maps whatever is yielded to a result, or to a generator to run in
+# turn. Without one, what's yielded is the generator itself. An exception
+# is thrown into the generator waiting on it, just as a call would raise.
+def walk(item, visit=None):
+  visit = visit or same
+  stack = []
+  value = visit(item)
+  error = None
+
+  while True:
+    if type(value) is GeneratorType:
+      stack.append(value)
+      value = None
+    elif not stack:
+      return value
+
+    try:
+      if error is None:
+        item = stack[-1].send(value)
+      else:
+        error, thrown = None, error
+        item = stack[-1].throw(thrown)
+    except StopIteration as stop:
+      stack.pop()
+      value = stop.value
+      continue
+    except BaseException as e:
+      stack.pop()
+      if not stack: raise
+      error = e
+      continue
+
+    try:
+      value = visit(item)
+    except BaseException as e:
+      error = e
+
+def same(item):
+  return item
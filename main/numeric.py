@@ -0,0 +1,431 @@
+from nodes import NumberNode, ListNode, VarAssignNode, BinOpNode, UnaryOpNode, CallNode, walk
+from tokens import Token
+from contextlib import nullcontext
+from fractions import Fraction
+import decimal
+import math
+
+# NUMERIC BACKENDS
+# A backend decides what Python type a session's numbers are and how the math
+# builtins compute on them. Arithmetic itself is just the type's operators,
+# so Number never needs to know which backend made its value:
+#
+#   float     Python int and float, rounded the way the builtins always have
+#   fraction  exact rationals; results that can't be rational are floats
+#   decimal   decimals to a chosen precision, trig and all
+#
+# Literals are read from their source text, so 0.1 is exactly 1/10 in the
+# exact backends rather than the float nearest it.
+def realnum(value):
+  return float(value) if (float(value) % 1) else int(value)
+
+class FloatBackend:
+  name = 'float'
+
+  def scope(self):
+    return nullcontext()
+
+  def literal(self, tok):
+    return tok.value
+
+  def integer(self, value):
+    return value
+
+  def constants(self):
+    return {}
+
+  def abs(self, value):
+    return abs(realnum(value))
+
+  def floor(self, value):
+    return math.floor(realnum(value))
+
+  def ceil(self, value):
+    return math.ceil(realnum(value))
+
+  def log(self, value):
+    log = math.log10(realnum(value))
+    return round(log, 2) if log % 1 else int(log)
+
+  def sqrt(self, value):
+    # A root that isn't whole stays symbolic, as a string
+    square = math.sqrt(realnum(value))
+    return 'SQRT(%s)' % round(realnum(value), 2) if square % 1 else int(square)
+
+  def sin(self, value):
+    return round(math.sin(math.radians(realnum(value))), 2)
+
+  def cos(self, value):
+    return round(math.cos(math.radians(realnum(value))), 2)
+
+  def cot(self, value):
+    return round(1 / math.tan(math.radians(realnum(value))), 2)
+
+  def tan(self, value):
+    return round(math.tan(math.radians(realnum(value))), 2)
+
+  def asin(self, value):
+    return round(math.asin(math.radians(realnum(value))), 2)
+
+  def acos(self, value):
+    return round(math.acos(math.radians(realnum(value))), 2)
+
+  def acot(self, value):
+    return round((math.pi / 2) - math.atan(math.radians(realnum(value))), 2)
+
+  def atan(self, value):
+    return round(math.atan(math.radians(realnum(value))), 2)
+
+  def __repr__(self):
+    return f'<numeric {self.name}>'
+
+class FractionBackend(FloatBackend):
+  name = 'fraction'
+
+  # Trig of a whole number of degrees, where the result is rational
+  sin_table = {0: 0, 30: Fraction(1, 2), 90: 1, 150: Fraction(1, 2), 180: 0, 210: Fraction(-1, 2), 270: -1, 330: Fraction(-1, 2)}
+  tan_table = {0: 0, 45: 1, 135: -1}
+
+  def literal(self, tok):
+    return Fraction(literal_text(tok))
+
+  def integer(self, value):
+    return Fraction(value)
+
+  def abs(self, value):
+    return abs(value)
+
+  def floor(self, value):
+    return math.floor(value)
+
+  def ceil(self, value):
+    return math.ceil(value)
+
+  def log(self, value):
+    if value <= 0: raise ValueError('math domain error')
+    value = Fraction(value)
+
+    # Exact for powers of ten, 10^k and 1/10^k
+    for power, rest, sign in ((value.numerator, value.denominator, 1), (value.denominator, value.numerator, -1)):
+      digits = str(power)
+      if rest == 1 and digits.rstrip('0') == '1': return sign * (len(digits) - 1)
+    # Taken on the integers, which can be far past the range of a float
+    return math.log10(value.numerator) - math.log10(value.denominator)
+
+  def sqrt(self, value):
+    if value < 0: raise ValueError('math domain error')
+    value = Fraction(value)
+    numerator, denominator = math.isqrt(value.numerator), math.isqrt(value.denominator)
+    if numerator * numerator == value.numerator and denominator * denominator == value.denominator:
+      return Fraction(numerator, denominator)
+    return f'SQRT({value})'
+
+  def degrees(self, value, table, period):
+    if Fraction(value).denominator == 1: return table.get(int(value) % period)
+
+  def sin(self, value):
+    exact = self.degrees(value, self.sin_table, 360)
+    return math.sin(math.radians(value)) if exact is None else exact
+
+  def cos(self, value):
+    exact = self.degrees(value + 90, self.sin_table, 360)
+    return math.cos(math.radians(value)) if exact is None else exact
+
+  def tan(self, value):
+    exact = self.degrees(value, self.tan_table, 180)
+    return math.tan(math.radians(value)) if exact is None else exact
+
+  def cot(self, value):
+    exact = self.degrees(value, self.tan_table, 180)
+    if exact not in (None, 0): return 1 / Fraction(exact)
+    return 1 / math.tan(math.radians(value))
+
+  def asin(self, value):
+    return 0 if value == 0 else math.asin(math.radians(value))
+
+  def acos(self, value):
+    return math.acos(math.radians(value))
+
+  def acot(self, value):
+    return (math.pi / 2) - math.atan(math.radians(value))
+
+  def atan(self, value):
+    return 0 if value == 0 else math.atan(math.radians(value))
+
+class DecimalBackend(FloatBackend):
+  name = 'decimal'
+
+  def __init__(self, precision=28):
+    self.precision = precision
+    # Untrapped, so out-of-range results are NaN and Infinity as for floats
+    self.context = decimal.Context(prec=precision, traps=[])
+    self.constant_values = None
+    self.pi_value = None
+
+  def scope(self):
+    return decimal.localcontext(self.context)
+
+  def literal(self, tok):
+    return decimal.Decimal(literal_text(tok))
+
+  def integer(self, value):
+    return decimal.Decimal(value)
+
+  def constants(self):
+    if self.constant_values is None:
+      with self.scope():
+        self.constant_values = {'MATH_PI': +self.pi(), 'MATH_E': decimal.Decimal(1).exp()}
+    return self.constant_values
+
+  def abs(self, value):
+    return abs(value)
+
+  def floor(self, value):
+    return self.whole(value, decimal.ROUND_FLOOR)
+
+  def ceil(self, value):
+    return self.whole(value, decimal.ROUND_CEILING)
+
+  def whole(self, value, rounding):
+    # Rounded as a decimal, so Infinity and NaN (TAN(90), ASIN(90)) come
+    # through, and CEIL(-0.5) is 0 as in the other backends rather than -0
+    whole = decimal.Decimal(value).to_integral_value(rounding=rounding)
+    return whole.copy_abs() if whole.is_zero() else whole
+
+  def log(self, value):
+    if value <= 0: raise ValueError('math domain error')
+    return decimal.Decimal(value).log10()
+
+  def sqrt(self, value):
+    if value < 0: raise ValueError('math domain error')
+    return decimal.Decimal(value).sqrt()
+
+  def radians(self, value):
+    # Whole turns come off exactly before the series sees the angle
+    return decimal.Decimal(value) % 360 * self.pi() / 180
+
+  # The series below follow the recipes in the decimal module's docs. Each
+  # builtin runs them with guard digits and rounds once at the end
+  def guarded(self):
+    context = self.context.copy()
+    context.prec += 4
+    return decimal.localcontext(context)
+
+  def pi(self):
+    if self.pi_value is None:
+      with decimal.localcontext(self.context) as ctx:
+        ctx.prec += 6
+        self.pi_value = self.pi_series()
+    return +self.pi_value
+
+  def pi_series(self):
+    with decimal.localcontext() as ctx:
+      ctx.prec += 2
+      three = decimal.Decimal(3)
+      lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+      while s != lasts:
+        lasts = s
+        n, na = n + na, na + 8
+        d, da = d + da, da + 32
+        t = (t * n) / d
+        s += t
+    return +s
+
+  def sin_rad(self, x):
+    with decimal.localcontext() as ctx:
+      ctx.prec += 2
+      i, lasts, s, fact, num, sign = 1, 0, x, 1, x, 1
+      while s != lasts:
+        lasts = s
+        i += 2
+        fact *= i * (i - 1)
+        num *= x * x
+        sign *= -1
+        s += num / fact * sign
+    return +s
+
+  def cos_rad(self, x):
+    with decimal.localcontext() as ctx:
+      ctx.prec += 2
+      i, lasts, s, fact, num, sign = 0, 0, 1, 1, 1, 1
+      while s != lasts:
+        lasts = s
+        i += 2
+        fact *= i * (i - 1)
+        num *= x * x
+        sign *= -1
+        s += num / fact * sign
+    return +s
+
+  def atan_rad(self, x):
+    with decimal.localcontext() as ctx:
+      ctx.prec += 2
+      if x.is_nan(): return x
+      if x.is_infinite(): return self.pi().copy_sign(x) / 2
+
+      # atan(x) = 2 atan(x / (1 + sqrt(1 + x^2))) halves the angle until the
+      # series converges quickly
+      halvings = 0
+      while abs(x) > decimal.Decimal('0.2'):
+        x = x / (1 + (1 + x * x).sqrt())
+        halvings += 1
+
+      i, lasts, s, num, sign = 1, 0, x, x, 1
+      while s != lasts:
+        lasts = s
+        i += 2
+        num *= x * x
+        sign *= -1
+        s += num / i * sign
+      s *= 2 ** halvings
+    return +s
+
+  def quadrant(self, value):
+    # Right angles are exact, where pi's last digit would otherwise show
+    value = decimal.Decimal(value)
+    if value.is_finite() and value % 90 == 0: return int(value % 360 / 90)
+
+  def sin(self, value):
+    quadrant = self.quadrant(value)
+    if quadrant is not None: return decimal.Decimal((0, 1, 0, -1)[quadrant])
+    with self.guarded():
+      result = self.sin_rad(self.radians(value))
+    return +result
+
+  def cos(self, value):
+    quadrant = self.quadrant(value)
+    if quadrant is not None: return decimal.Decimal((1, 0, -1, 0)[quadrant])
+    with self.guarded():
+      result = self.cos_rad(self.radians(value))
+    return +result
+
+  def tan(self, value):
+    with self.guarded():
+      result = self.sin(value) / self.cos(value)
+    return +result
+
+  def cot(self, value):
+    with self.guarded():
+      result = self.cos(value) / self.sin(value)
+    return +result
+
+  # The inverse functions take their argument through radians first, as the
+  # float builtins always have
+  def asin(self, value):
+    with self.guarded():
+      result = self.asin_rad(decimal.Decimal(value) * self.pi() / 180)
+    return +result
+
+  def acos(self, value):
+    with self.guarded():
+      asin = self.asin_rad(decimal.Decimal(value) * self.pi() / 180)
+      result = asin if asin.is_nan() else self.pi() / 2 - asin
+    return +result
+
+  def acot(self, value):
+    with self.guarded():
+      result = self.pi() / 2 - self.atan_rad(decimal.Decimal(value) * self.pi() / 180)
+    return +result
+
+  def atan(self, value):
+    with self.guarded():
+      result = self.atan_rad(decimal.Decimal(value) * self.pi() / 180)
+    return +result
+
+  def asin_rad(self, x):
+    if abs(x) > 1: return decimal.Decimal('NaN')
+    if abs(x) == 1: return (self.pi() / 2).copy_sign(x)
+    return self.atan_rad(x / (1 - x * x).sqrt())
+
+  # Backends of one precision compute alike, so they share the tables and
+  # cache entries keyed on the backend instead of adding their own
+  def __eq__(self, other):
+    return type(other) is type(self) and other.precision == self.precision
+
+  def __hash__(self):
+    return hash((type(self), self.precision))
+
+  def __repr__(self):
+    return f'<numeric decimal prec={self.precision}>'
+
+float_backend = FloatBackend()
+
+backends = {
+  'float': float_backend,
+  'fraction': FractionBackend(),
+  'decimal': DecimalBackend(),
+}
+
+def backend(numeric=None):
+  # A backend, or the name of a shared one
+  if numeric is None: return float_backend
+  if isinstance(numeric, str):
+    if numeric not in backends: raise ValueError(f'Unknown numeric backend {numeric!r}')
+    return backends[numeric]
+  return numeric
+
+def index(value):
+  # A whole number of any backend as a Python int, for repeating strings and
+  # indexing lists; None when it isn't whole. Floats never index, as they
+  # never have in the float backend
+  if isinstance(value, int): return value
+  if isinstance(value, float): return None
+  try:
+    whole = int(value)
+  except (TypeError, ValueError, OverflowError):
+    return None
+  return whole if whole == value else None
+
+def literal_text(tok):
+  text = tok.source.text[tok.start:tok.end]
+  return text if isinstance(text, str) else text.decode('ascii')
+
+# LITERALS
+# Rewrites every number literal as the backend's type before a program is
+# optimized or run. The tree is shared between sessions, so changed nodes are
+# new ones.
+class Literals:
+  def __init__(self, numeric):
+    self.numeric = numeric
+
+  def visit(self, node):
+    method_name = f'visit_{type(node).__name__}'
+    method = getattr(self, method_name, self.no_visit_method)
+    return method(node)
+
+  def no_visit_method(self, node):
+    return node
+
+  ###################################
+
+  def visit_NumberNode(self, node):
+    tok = node.tok
+    return NumberNode(Token(tok.type, self.numeric.literal(tok), tok.source, tok.start, tok.end))
+
+  def visit_ListNode(self, node):
+    element_nodes = []
+    for element_node in node.element_nodes:
+      element_nodes.append((yield element_node))
+    return ListNode(element_nodes, node.pos_start, node.pos_end)
+
+  def visit_VarAssignNode(self, node):
+    return VarAssignNode(node.var_name_tok, (yield node.value_node))
+
+  def visit_BinOpNode(self, node):
+    left = yield node.left_node
+    right = yield node.right_node
+    return BinOpNode(left, node.op_tok, right)
+
+  def visit_UnaryOpNode(self, node):
+    return UnaryOpNode(node.op_tok, (yield node.node))
+
+  def visit_CallNode(self, node):
+    node_to_call = yield node.node_to_call
+    arg_nodes = []
+    for arg_node in node.arg_nodes:
+      arg_nodes.append((yield arg_node))
+    return CallNode(node_to_call, arg_nodes)
+
+def convert(node, numeric):
+  if numeric is float_backend: return node
+  return walk(node, Literals(numeric).visit)
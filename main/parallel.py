@@ -0,0 +1,106 @@
+from main import Value, Number, Session, parse, compile_node, run
+from cache import LRUCache
+from errors import RTError
+from concurrent.futures import ProcessPoolExecutor
+import serialize
+import os
+
+# PARALLEL
+# Jobs are parsed once in the calling process and sent to a process pool in
+# chunks. A chunk carries the serialized AST of each program it uses once, so
+# workers only ever deserialize and compile, and cache the compiled programs.
+pool = None
+pool_workers = None
+
+def worker_pool(workers=None):
+  global pool, pool_workers
+
+  workers = workers or os.cpu_count() or 1
+  if pool is None or pool_workers != workers:
+    if pool: pool.shutdown()
+    pool = ProcessPoolExecutor(workers, initializer=init_worker)
+    pool_workers = workers
+  return pool
+
+def shutdown():
+  global pool, pool_workers
+
+  if pool: pool.shutdown()
+  pool = pool_workers = None
+
+def evaluate_many(jobs, workers=None, chunksize=None):
+  jobs = list(jobs)
+  results = [None] * len(jobs)
+  program_ids = {}
+  blobs = []
+  pending = []
+
+  for index, job in enumerate(jobs):
+    fn, text = job[0], job[1]
+    bindings = job[2] if len(job) > 2 else {}
+
+    if (fn, text) not in program_ids:
+      node, error = parse(fn, text)
+      if error:
+        program_ids[(fn, text)] = error
+      else:
+        program_ids[(fn, text)] = len(blobs)
+        blobs.append(serialize.dumps(node))
+
+    program_id = program_ids[(fn, text)]
+    if isinstance(program_id, Exception):
+      results[index] = None, program_id
+    else:
+      pending.append((index, program_id, bindings))
+
+  if not pending: return results
+
+  pool = worker_pool(workers)
+  if not chunksize:
+    chunksize = max(1, min(256, len(pending) // (pool_workers * 4)))
+
+  futures = []
+  for start in range(0, len(pending), chunksize):
+    chunk = pending[start:start + chunksize]
+    chunk_blobs = {program_id: blobs[program_id] for _, program_id, _ in chunk}
+    items = [(program_id, bindings) for _, program_id, bindings in chunk]
+    futures.append((chunk, pool.submit(run_chunk, chunk_blobs, items)))
+
+  for chunk, future in futures:
+    for (index, _, _), result in zip(chunk, future.result()):
+      results[index] = result
+
+  return results
+
+# WORKER
+compiled_programs = LRUCache(256)
+
+def init_worker():
+  # Run one program so the builtins, compiler and caches are warm before the
+  # first chunk arrives
+  run('<warmup>', 'SIN(ABS(-1) * MATH_PI)')
+
+def run_chunk(blobs, items):
+  programs = {}
+
+  for program_id, blob in blobs.items():
+    program = compiled_programs.get(blob)
+    if program is None:
+      program = compile_node(serialize.loads(blob))
+      compiled_programs.set(blob, program)
+    programs[program_id] = program
+
+  return [run_job(programs[program_id], bindings) for program_id, bindings in items]
+
+def run_job(program, bindings):
+  # Every job gets its own session, so bindings and VAR assignments never
+  # leak between jobs
+  context = Session().new_context()
+
+  for name, value in bindings.items():
+    context.symbol_table.set(name, value if isinstance(value, Value) else Number(value))
+
+  try:
+    return program(context), None
+  except RTError as error:
+    return None, error
@@ -1,39 +1,51 @@
 from errors import InvalidSyntaxError
 from tokens import *
-from nodes import VarAccessNode,VarAssignNode,UnaryOpNode,CallNode,ListNode,BinOpNode,StringNode,NumberNode
-
+from nodes import VarAccessNode,VarAssignNode,UnaryOpNode,CallNode,ListNode,BinOpNode,StringNode,NumberNode,walk
+
+# PRECEDENCE
+# Binding power of each binary operator, and the power its right operand is
+# parsed at. Left-associative operators parse the right side at their own
+# power, so the next operator of the same power ends it; '^' parses it at
+# factor level, so 2 ^ 3 ^ 4 and 2 ^ -3 nest to the right.
+EXPR, COMP_EXPR, ARITH_EXPR, TERM, FACTOR = 0, 1, 2, 3, 4
+
+binary_powers = {
+  TT_EE: (ARITH_EXPR, ARITH_EXPR),
+  TT_NE: (ARITH_EXPR, ARITH_EXPR),
+  TT_LT: (ARITH_EXPR, ARITH_EXPR),
+  TT_GT: (ARITH_EXPR, ARITH_EXPR),
+  TT_LTE: (ARITH_EXPR, ARITH_EXPR),
+  TT_GTE: (ARITH_EXPR, ARITH_EXPR),
+  TT_PLUS: (TERM, TERM),
+  TT_MINUS: (TERM, TERM),
+  TT_MUL: (FACTOR, FACTOR),
+  TT_DIV: (FACTOR, FACTOR),
+  TT_MOD: (FACTOR, FACTOR),
+  TT_POW: (FACTOR + 1, FACTOR),
+}
+
+keyword_powers = {
+  'AND': (COMP_EXPR, COMP_EXPR),
+  'OR': (COMP_EXPR, COMP_EXPR),
+}
+
+# Tokens that can begin an expression at any level
+prefix_types = frozenset((TT_INT, TT_FLOAT, TT_STRING, TT_IDENTIFIER, TT_LPAREN, TT_LSQUARE, TT_PLUS, TT_MINUS))
+
+EXPECTED_EXPR = "Expected 'VAR', int, float, identifier, '+', '-', '('"
+EXPECTED_ATOM = "Expected int, float, identifier, '+', '-', '(', '['"
 
 class ParseResult:
   def __init__(self):
     self.error = None
     self.node = None
-    self.last_registered_advance_count = 0
-    self.advance_count = 0
-    self.to_reverse_count = 0
-
-  def register_advancement(self):
-    self.last_registered_advance_count = 1
-    self.advance_count += 1
-
-  def register(self, res):
-    self.last_registered_advance_count = res.advance_count
-    self.advance_count += res.advance_count
-    if res.error: self.error = res.error
-    return res.node
-
-  def try_register(self, res):
-    if res.error:
-      self.to_reverse_count = res.advance_count
-      return None
-    return self.register(res)
 
   def success(self, node):
     self.node = node
     return self
 
   def failure(self, error):
-    if not self.error or self.last_registered_advance_count == 0:
-      self.error = error
+    self.error = error
     return self
 
 
@@ -45,308 +57,226 @@ class Parser:
 
   def advance(self):
     self.tok_idx += 1
-    self.update_current_tok()
+    if self.tok_idx < len(self.tokens):
+      self.current_tok = self.tokens[self.tok_idx]
     return self.current_tok
 
-  def reverse(self, amount=1):
-    self.tok_idx -= amount
-    self.update_current_tok()
-    return self.current_tok
+  def parse(self, continued=False):
+    # continued: the tokens carry on a program whose earlier statements were
+    # parsed apart from them, as a stream is, so even the first statement
+    # fails the way a later one would in the whole program
+    res = ParseResult()
 
-  def update_current_tok(self):
-    if self.tok_idx >= 0 and self.tok_idx < len(self.tokens):
-      self.current_tok = self.tokens[self.tok_idx]
+    try:
+      node = walk(self.statements(continued))
+    except InvalidSyntaxError as error:
+      return res.failure(error)
 
-  def parse(self):
-    res = self.statements()
-    if not res.error and self.current_tok.type != TT_EOF:
+    if self.current_tok.type != TT_EOF:
       return res.failure(InvalidSyntaxError(
         self.current_tok.pos_start, self.current_tok.pos_end,
         "Token cannot appear after previous tokens"
       ))
-    return res
+    return res.success(node)
+
+  def starts_expr(self, level=EXPR):
+    # One token of lookahead decides whether an expression can begin here
+    tok = self.current_tok
+    if tok.type in prefix_types: return True
+    if tok.type != TT_KEYWORD: return False
+    return (tok.value == 'VAR' and level == EXPR) or (tok.value == 'NOT' and level <= COMP_EXPR)
+
+  def expected(self, details):
+    raise InvalidSyntaxError(
+      self.current_tok.pos_start, self.current_tok.pos_end,
+      details
+    )
 
   ###################################
+  # Rules that contain a nested expression are generators run by walk: they
+  # yield self.expr() and get the parsed node back, so brackets nest as deep
+  # as memory allows rather than as deep as the Python stack
 
-  def statements(self):
-    res = ParseResult()
+  def statements(self, continued=False):
     statements = []
     pos_start = self.current_tok.pos_start.copy()
-
-    while self.current_tok.type == TT_NEWLINE:
-      res.register_advancement()
-      self.advance()
-
-    statement = res.register(self.statement())
-    if res.error: return res
-    statements.append(statement)
-
-    more_statements = True
+    later = continued
 
     while True:
-      newline_count = 0
       while self.current_tok.type == TT_NEWLINE:
-        res.register_advancement()
         self.advance()
-        newline_count += 1
-      if newline_count == 0:
-        more_statements = False
-      
-      if not more_statements: break
-      statement = res.try_register(self.statement())
-      if not statement:
-        self.reverse(res.to_reverse_count)
-        more_statements = False
-        continue
-      statements.append(statement)
 
-    return res.success(ListNode(
+      if not later:
+        statements.append((yield self.expr()))
+      else:
+        # A statement that can't start here, or breaks off partway, leaves
+        # its first token as the one that can't follow the program so far
+        if not self.starts_expr(): break
+        tok = self.current_tok
+        try:
+          statements.append((yield self.expr()))
+        except InvalidSyntaxError:
+          raise InvalidSyntaxError(tok.pos_start, tok.pos_end, "Token cannot appear after previous tokens")
+
+      later = True
+      if self.current_tok.type != TT_NEWLINE: break
+
+    return ListNode(
       statements,
       pos_start,
       self.current_tok.pos_end.copy()
-    ))
-
-  def statement(self):
-    res = ParseResult()
-    pos_start = self.current_tok.pos_start.copy()
-
-    expr = res.register(self.expr())
-    if res.error:
-      return res.failure(InvalidSyntaxError(
-        self.current_tok.pos_start, self.current_tok.pos_end,
-        "Expected 'VAR', int, float, identifier, '+', '-', '('"
-      ))
-    return res.success(expr)
+    )
 
   def expr(self):
-    res = ParseResult()
-
-    if self.current_tok.matches(TT_KEYWORD, 'VAR'):
-      res.register_advancement()
-      self.advance()
+    # Precedence climbing over explicit stacks: the operands so far and the
+    # operators still waiting for their right side, each with the level it
+    # parses that side at. An operator first applies every waiting one that
+    # binds at least as tightly as it does
+    operands = []
+    operators = []
+    level = EXPR
 
-      if self.current_tok.type != TT_IDENTIFIER:
-        return res.failure(InvalidSyntaxError(
-          self.current_tok.pos_start, self.current_tok.pos_end,
-          "Expected identifier"
-        ))
+    while True:
+      # Prefix operators, where the operand they start is allowed them
+      tok = self.current_tok
 
-      var_name = self.current_tok
-      res.register_advancement()
-      self.advance()
+      if tok.type == TT_KEYWORD and tok.value == 'VAR' and level == EXPR:
+        operators.append((VarAssignNode, self.var_name(), EXPR))
+        continue
+      if tok.type == TT_KEYWORD and tok.value == 'NOT' and level <= COMP_EXPR:
+        self.advance()
+        operators.append((UnaryOpNode, tok, COMP_EXPR))
+        level = COMP_EXPR
+        continue
+      if tok.type in (TT_PLUS, TT_MINUS):
+        self.advance()
+        operators.append((UnaryOpNode, tok, FACTOR))
+        level = FACTOR
+        continue
 
-      if self.current_tok.type != TT_EQ:
-        return res.failure(InvalidSyntaxError(
-          self.current_tok.pos_start, self.current_tok.pos_end,
-          "Expected '='"
-        ))
+      # Where a whole expression or comparison was expected, a token that
+      # can't start one is reported as such; deeper in, as a missing atom
+      if level <= COMP_EXPR and not self.starts_expr(level):
+        self.expected(EXPECTED_EXPR)
 
-      res.register_advancement()
-      self.advance()
-      expr = res.register(self.expr())
-      if res.error: return res
-      return res.success(VarAssignNode(var_name, expr))
+      if tok.type == TT_LPAREN:
+        self.advance()
+        node = yield self.expr()
+        if self.current_tok.type != TT_RPAREN:
+          self.expected("Expected ')'")
+        self.advance()
+      elif tok.type == TT_LSQUARE:
+        node = yield from self.list_expr()
+      else:
+        node = self.atom()
 
-    node = res.register(self.bin_op(self.comp_expr, ((TT_KEYWORD, 'AND'), (TT_KEYWORD, 'OR'))))
+      if self.current_tok.type == TT_LPAREN:
+        node = yield from self.call(node)
+      operands.append(node)
 
-    if res.error:
-      return res.failure(InvalidSyntaxError(
-        self.current_tok.pos_start, self.current_tok.pos_end,
-        "Expected 'VAR', int, float, identifier, '+', '-', '('"
-      ))
+      op_tok = self.current_tok
+      if op_tok.type == TT_KEYWORD:
+        powers = keyword_powers.get(op_tok.value)
+      else:
+        powers = binary_powers.get(op_tok.type)
+      if powers is None: break
 
-    return res.success(node)
+      while operators and operators[-1][2] >= powers[0]:
+        self.reduce(operands, operators.pop())
 
-  def comp_expr(self):
-    res = ParseResult()
-
-    if self.current_tok.matches(TT_KEYWORD, 'NOT'):
-      op_tok = self.current_tok
-      res.register_advancement()
       self.advance()
+      operators.append((BinOpNode, op_tok, powers[1]))
+      level = powers[1]
 
-      node = res.register(self.comp_expr())
-      if res.error: return res
-      return res.success(UnaryOpNode(op_tok, node))
-    
-    node = res.register(self.bin_op(self.arith_expr, (TT_EE, TT_NE, TT_LT, TT_GT, TT_LTE, TT_GTE)))
-    
-    if res.error:
-      return res.failure(InvalidSyntaxError(
-        self.current_tok.pos_start, self.current_tok.pos_end,
-        "Expected 'VAR', int, float, identifier, '+', '-', '('"
-      ))
+    while operators:
+      self.reduce(operands, operators.pop())
+    return operands[0]
 
-    return res.success(node)
+  def reduce(self, operands, operator):
+    node_type, tok, _ = operator
+    right = operands.pop()
 
-  def arith_expr(self):
-    return self.bin_op(self.term, (TT_PLUS, TT_MINUS))
+    if node_type is BinOpNode:
+      operands.append(BinOpNode(operands.pop(), tok, right))
+    else:
+      operands.append(node_type(tok, right))
 
-  def term(self):
-    return self.bin_op(self.factor, (TT_MUL, TT_DIV, TT_MOD))
+  def var_name(self):
+    self.advance()
 
-  def factor(self):
-    res = ParseResult()
-    tok = self.current_tok
+    if self.current_tok.type != TT_IDENTIFIER:
+      self.expected("Expected identifier")
 
-    if tok.type in (TT_PLUS, TT_MINUS):
-      res.register_advancement()
-      self.advance()
-      factor = res.register(self.factor())
-      if res.error: return res
-      return res.success(UnaryOpNode(tok, factor))
+    var_name = self.current_tok
+    self.advance()
 
-    return self.power()
+    if self.current_tok.type != TT_EQ:
+      self.expected("Expected '='")
 
-  def power(self):
-    return self.bin_op(self.call, (TT_POW, ), self.factor)
+    self.advance()
+    return var_name
 
-  def call(self):
-    res = ParseResult()
-    atom = res.register(self.atom())
-    if res.error: return res
+  def call(self, atom):
+    self.advance()
+    arg_nodes = []
 
-    if self.current_tok.type == TT_LPAREN:
-      res.register_advancement()
+    if self.current_tok.type == TT_RPAREN:
       self.advance()
-      arg_nodes = []
+    else:
+      if not self.starts_expr():
+        self.expected("Expected ')', 'VAR', int, float, identifier, '+', '-', '(', '['")
+      arg_nodes.append((yield self.expr()))
 
-      if self.current_tok.type == TT_RPAREN:
-        res.register_advancement()
+      while self.current_tok.type == TT_COMMA:
         self.advance()
-      else:
-        arg_nodes.append(res.register(self.expr()))
-        if res.error:
-          return res.failure(InvalidSyntaxError(
-            self.current_tok.pos_start, self.current_tok.pos_end,
-            "Expected ')', 'VAR', int, float, identifier, '+', '-', '(', '['"
-          ))
-
-        while self.current_tok.type == TT_COMMA:
-          res.register_advancement()
-          self.advance()
+        arg_nodes.append((yield self.expr()))
 
-          arg_nodes.append(res.register(self.expr()))
-          if res.error: return res
+      if self.current_tok.type != TT_RPAREN:
+        self.expected("Expected ',' or ')'")
 
-        if self.current_tok.type != TT_RPAREN:
-          return res.failure(InvalidSyntaxError(
-            self.current_tok.pos_start, self.current_tok.pos_end,
-            f"Expected ',' or ')'"
-          ))
-
-        res.register_advancement()
-        self.advance()
-      return res.success(CallNode(atom, arg_nodes))
-    return res.success(atom)
+      self.advance()
+    return CallNode(atom, arg_nodes)
 
   def atom(self):
-    res = ParseResult()
     tok = self.current_tok
 
     if tok.type in (TT_INT, TT_FLOAT):
-      res.register_advancement()
       self.advance()
-      return res.success(NumberNode(tok))
+      return NumberNode(tok)
 
     elif tok.type == TT_STRING:
-      res.register_advancement()
       self.advance()
-      return res.success(StringNode(tok))
+      return StringNode(tok)
 
     elif tok.type == TT_IDENTIFIER:
-      res.register_advancement()
-      self.advance()
-      return res.success(VarAccessNode(tok))
-
-    elif tok.type == TT_LPAREN:
-      res.register_advancement()
       self.advance()
-      expr = res.register(self.expr())
-      if res.error: return res
-      if self.current_tok.type == TT_RPAREN:
-        res.register_advancement()
-        self.advance()
-        return res.success(expr)
-      else:
-        return res.failure(InvalidSyntaxError(
-          self.current_tok.pos_start, self.current_tok.pos_end,
-          "Expected ')'"
-        ))
+      return VarAccessNode(tok)
 
-    elif tok.type == TT_LSQUARE:
-      list_expr = res.register(self.list_expr())
-      if res.error: return res
-      return res.success(list_expr)
-
-    return res.failure(InvalidSyntaxError(
-      tok.pos_start, tok.pos_end,
-      "Expected int, float, identifier, '+', '-', '(', '['"
-    ))
+    self.expected(EXPECTED_ATOM)
 
   def list_expr(self):
-    res = ParseResult()
     element_nodes = []
     pos_start = self.current_tok.pos_start.copy()
-
-    if self.current_tok.type != TT_LSQUARE:
-      return res.failure(InvalidSyntaxError(
-        self.current_tok.pos_start, self.current_tok.pos_end,
-        f"Expected '['"
-      ))
-
-    res.register_advancement()
     self.advance()
 
     if self.current_tok.type == TT_RSQUARE:
-      res.register_advancement()
       self.advance()
     else:
-      element_nodes.append(res.register(self.expr()))
-      if res.error:
-        return res.failure(InvalidSyntaxError(
-          self.current_tok.pos_start, self.current_tok.pos_end,
-          "Expected ']', 'VAR', int, float, identifier, '+', '-', '(', '['"
-        ))
+      if not self.starts_expr():
+        self.expected("Expected ']', 'VAR', int, float, identifier, '+', '-', '(', '['")
+      element_nodes.append((yield self.expr()))
 
       while self.current_tok.type == TT_COMMA:
-        res.register_advancement()
         self.advance()
-
-        element_nodes.append(res.register(self.expr()))
-        if res.error: return res
+        element_nodes.append((yield self.expr()))
 
       if self.current_tok.type != TT_RSQUARE:
-        return res.failure(InvalidSyntaxError(
-          self.current_tok.pos_start, self.current_tok.pos_end,
-          f"Expected ',' or ']'"
-        ))
+        self.expected("Expected ',' or ']'")
 
-      res.register_advancement()
       self.advance()
 
-    return res.success(ListNode(
+    return ListNode(
       element_nodes,
       pos_start,
       self.current_tok.pos_end.copy()
-    ))
-
-  ###################################
-
-  def bin_op(self, func_a, ops, func_b=None):
-    if func_b == None:
-      func_b = func_a
-    
-    res = ParseResult()
-    left = res.register(func_a())
-    if res.error: return res
-
-    while self.current_tok.type in ops or (self.current_tok.type, self.current_tok.value) in ops:
-      op_tok = self.current_tok
-      res.register_advancement()
-      self.advance()
-      right = res.register(func_b())
-      if res.error: return res
-      left = BinOpNode(left, op_tok, right)
-
-    return res.success(left)
+    )
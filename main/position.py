@@ -1,20 +1,59 @@
+from bisect import bisect_right
+
+class Source:
+  __slots__ = ('fn', 'text', 'line_offset', 'line_starts')
+
+  # line_offset is the line the text starts on, for text cut out of a file.
+  # text can also be UTF-8 bytes (an mmap of the file) indexed by byte offset
+  def __init__(self, fn, text, line_offset=0):
+    self.fn = fn
+    self.text = text
+    self.line_offset = line_offset
+    self.line_starts = None
+
+  def line_col(self, idx):
+    text = self.text
+    if self.line_starts is None:
+      separator = '\n' if isinstance(text, str) else b'\n'
+      self.line_starts = [0]
+      newline = text.find(separator)
+      while newline >= 0:
+        self.line_starts.append(newline + 1)
+        newline = text.find(separator, newline + 1)
+
+    ln = bisect_right(self.line_starts, idx) - 1
+    line_start = self.line_starts[ln]
+    if isinstance(text, str):
+      return ln + self.line_offset, idx - line_start
+    # Columns count characters, not bytes, and carry on past the end of the
+    # text as they do for a str
+    return ln + self.line_offset, len(text[line_start:idx].decode('utf-8', 'ignore')) + max(idx - len(text), 0)
+
 class Position:
-  def __init__(self, idx, ln, col, fn, ftxt):
+  __slots__ = ('idx', 'source', 'is_end')
+
+  # An end position sits one column after the last character of a token,
+  # on that character's line, even when the character is a newline.
+  def __init__(self, idx, source, is_end=False):
     self.idx = idx
-    self.ln = ln
-    self.col = col
-    self.fn = fn
-    self.ftxt = ftxt
+    self.source = source
+    self.is_end = is_end
+
+  @property
+  def ln(self):
+    return self.source.line_col(self.idx - self.is_end)[0]
 
-  def advance(self, current_char=None):
-    self.idx += 1
-    self.col += 1
+  @property
+  def col(self):
+    return self.source.line_col(self.idx - self.is_end)[1] + self.is_end
 
-    if current_char == '\n':
-      self.ln += 1
-      self.col = 0
+  @property
+  def fn(self):
+    return self.source.fn
 
-    return self
+  @property
+  def ftxt(self):
+    return self.source.text
 
   def copy(self):
-    return Position(self.idx, self.ln, self.col, self.fn, self.ftxt)
\ No newline at end of file
+    return Position(self.idx, self.source, self.is_end)
@@ -0,0 +1,137 @@
+from nodes import NumberNode, StringNode, ListNode, VarAccessNode, VarAssignNode, BinOpNode, UnaryOpNode, CallNode
+from position import Position, Source
+from tokens import Token
+import marshal
+
+# SERIALIZE
+# An AST is flattened into a tuple of plain values and marshalled, with the
+# program text stored once so positions and error messages survive the
+# round trip. Nodes are listed children first, each tagged by its index in
+# NODE_TYPES, so the tuple is flat however deep the tree and the decoder
+# rebuilds it off a stack.
+FORMAT = 3
+
+NODE_TYPES = [NumberNode, StringNode, ListNode, VarAccessNode, VarAssignNode, BinOpNode, UnaryOpNode, CallNode]
+NODE_TAGS = {node_type: tag for tag, node_type in enumerate(NODE_TYPES)}
+
+def dumps(node):
+  source = node.pos_start.source
+  # A mapped file is stored as its bytes, which positions index into
+  text = source.text if isinstance(source.text, (str, bytes)) else bytes(source.text)
+  return marshal.dumps((FORMAT, source.fn, text, source.line_offset, Encoder().encode(node)))
+
+def loads(data):
+  format_, *rest = marshal.loads(data)
+  if format_ != FORMAT:
+    raise ValueError(f'Unsupported AST format {format_}')
+  fn, text, line_offset, tree = rest
+  return Decoder(Source(fn, text, line_offset)).decode(tree)
+
+class Encoder:
+  def encode(self, node):
+    # Written parent first with the last child next, then reversed, which
+    # puts every node after its children in their order
+    records = []
+    nodes = [node]
+
+    while nodes:
+      node = nodes.pop()
+      method_name = f'encode_{type(node).__name__}'
+      method = getattr(self, method_name, self.no_encode_method)
+      fields, child_nodes = method(node)
+      records.append((NODE_TAGS[type(node)],) + fields)
+      nodes.extend(child_nodes)
+
+    records.reverse()
+    return tuple(records)
+
+  def no_encode_method(self, node):
+    raise Exception(f'No encode_{type(node).__name__} method defined')
+
+  def token(self, tok):
+    return (tok.type, tok.value, tok.start, tok.end)
+
+  ###################################
+  # Each returns the node's own fields and its children
+
+  def encode_NumberNode(self, node):
+    return self.token(node.tok), ()
+
+  def encode_StringNode(self, node):
+    return self.token(node.tok), ()
+
+  def encode_ListNode(self, node):
+    return (len(node.element_nodes), node.pos_start.idx, node.pos_end.idx), node.element_nodes
+
+  def encode_VarAccessNode(self, node):
+    return self.token(node.var_name_tok), ()
+
+  def encode_VarAssignNode(self, node):
+    return self.token(node.var_name_tok), (node.value_node,)
+
+  def encode_BinOpNode(self, node):
+    return self.token(node.op_tok), (node.left_node, node.right_node)
+
+  def encode_UnaryOpNode(self, node):
+    return self.token(node.op_tok), (node.node,)
+
+  def encode_CallNode(self, node):
+    return (len(node.arg_nodes),), (node.node_to_call, *node.arg_nodes)
+
+class Decoder:
+  def __init__(self, source):
+    self.source = source
+    self.methods = [getattr(self, f'decode_{node_type.__name__}') for node_type in NODE_TYPES]
+
+  def decode(self, tree):
+    # Each record takes its children off the stack and leaves its node
+    nodes = []
+    methods = self.methods
+    for record in tree:
+      nodes.append(methods[record[0]](nodes, *record[1:]))
+
+    if len(nodes) != 1: raise ValueError('Malformed AST')
+    return nodes[0]
+
+  def token(self, type_, value, start, end):
+    return Token(type_, value, self.source, start, end)
+
+  def pop(self, nodes, count):
+    if count > len(nodes): raise ValueError('Malformed AST')
+    popped = nodes[len(nodes) - count:]
+    del nodes[len(nodes) - count:]
+    return popped
+
+  ###################################
+
+  def decode_NumberNode(self, nodes, *tok):
+    return NumberNode(self.token(*tok))
+
+  def decode_StringNode(self, nodes, *tok):
+    return StringNode(self.token(*tok))
+
+  def decode_ListNode(self, nodes, count, start, end):
+    return ListNode(
+      self.pop(nodes, count),
+      Position(start, self.source),
+      Position(end, self.source, True)
+    )
+
+  def decode_VarAccessNode(self, nodes, *tok):
+    return VarAccessNode(self.token(*tok))
+
+  def decode_VarAssignNode(self, nodes, *tok):
+    value_node, = self.pop(nodes, 1)
+    return VarAssignNode(self.token(*tok), value_node)
+
+  def decode_BinOpNode(self, nodes, *tok):
+    left, right = self.pop(nodes, 2)
+    return BinOpNode(left, self.token(*tok), right)
+
+  def decode_UnaryOpNode(self, nodes, *tok):
+    node, = self.pop(nodes, 1)
+    return UnaryOpNode(self.token(*tok), node)
+
+  def decode_CallNode(self, nodes, count):
+    node_to_call, *arg_nodes = self.pop(nodes, count + 1)
+    return CallNode(node_to_call, arg_nodes)
@@ -0,0 +1,207 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+
+import main
+from main import Session
+
+# SERVER
+# Serves main.run over a JSON-lines protocol on TCP or a Unix socket. Each
+# line is one request and gets one response line:
+#
+#   {"id": 1, "text": "VAR x = 2\nx ^ 2"}
+#   {"id": 1, "value": "2, 4", "error": null}
+#
+#   {"op": "stats"}
+#   {"requests": 1, "coalesced": 0, "pending": 0, "latency_ms": {...}}
+#
+# Every connection gets its own session, and its requests are evaluated in
+# the order they were sent. Compiling and evaluating run on an executor so
+# the event loop stays free to read and write.
+class Server:
+  def __init__(self, max_pending=64, workers=None, history=10000):
+    self.pending = asyncio.Semaphore(max_pending)
+    self.executor = ThreadPoolExecutor(workers)
+    self.compiling = {}
+    self.latencies = deque(maxlen=history)
+    self.requests = 0
+    self.coalesced = 0
+    self.in_flight = 0
+
+  async def handle_connection(self, reader, writer):
+    loop = asyncio.get_running_loop()
+    session = Session()
+    write_lock = asyncio.Lock()
+    previous = None
+    tasks = []
+
+    try:
+      while True:
+        line = await self.read_line(reader)
+        if line == b'': break
+        if line is not None and not line.strip(): continue
+
+        # Backpressure: stop reading once max_pending requests are in flight,
+        # which lets the socket buffers fill up and slows the client down
+        await self.pending.acquire()
+        self.in_flight += 1
+        done = loop.create_future()
+        tasks.append(asyncio.create_task(
+          self.handle_line(line, time.perf_counter(), session, previous, done, writer, write_lock)
+        ))
+        tasks = [task for task in tasks if not task.done()]
+        previous = done
+
+      if tasks: await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+      writer.close()
+      try:
+        await writer.wait_closed()
+      except ConnectionError:
+        pass
+
+  async def read_line(self, reader):
+    # The next line, b'' once the client is done, or None for a line over the
+    # reader's limit, which is skipped up to its newline
+    try:
+      return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as error:
+      return error.partial
+    except asyncio.LimitOverrunError:
+      pass
+
+    while True:
+      try:
+        await reader.readuntil(b'\n')
+        return None
+      except asyncio.IncompleteReadError:
+        return None
+      except asyncio.LimitOverrunError as error:
+        await reader.readexactly(error.consumed)
+
+  async def handle_line(self, line, received, session, previous, done, writer, write_lock):
+    try:
+      try:
+        if line is None: raise ValueError('line too long')
+        request = json.loads(line)
+        if not isinstance(request, dict): raise ValueError('request must be an object')
+      except ValueError as error:
+        response = {'id': None, 'value': None, 'error': f'Bad request: {error}'}
+      else:
+        if request.get('op', 'run') == 'stats':
+          if previous: await previous
+          response = self.stats()
+        else:
+          try:
+            response = await self.run(request, session, previous)
+          except Exception as error:
+            response = {'id': request.get('id'), 'value': None, 'error': f'{type(error).__name__}: {error}'}
+
+      # Every response, a bad request's too, waits for the ones before it
+      if previous: await previous
+      async with write_lock:
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+      self.latencies.append(time.perf_counter() - received)
+    finally:
+      if not done.done(): done.set_result(None)
+      self.in_flight -= 1
+      self.pending.release()
+
+  async def run(self, request, session, previous):
+    self.requests += 1
+    fn = request.get('fn', '<request>')
+    text = request.get('text', '')
+
+    program, error = await self.compile(fn, text, session.numeric)
+
+    # Wait for the connection's earlier requests, so VARs land in order
+    if previous: await previous
+
+    if not error:
+      loop = asyncio.get_running_loop()
+      value, error = await loop.run_in_executor(self.executor, main.execute, program, session)
+
+    return {
+      'id': request.get('id'),
+      'value': None if error else repr(value),
+      'error': error.as_string() if error else None,
+    }
+
+  async def compile(self, fn, text, numeric):
+    program = main.program_cache.get((fn, text, numeric))
+    if program: return program, None
+
+    # Identical programs that arrive while one is compiling share its result
+    future = self.compiling.get((fn, text, numeric))
+    if future:
+      self.coalesced += 1
+      return await asyncio.shield(future)
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(self.executor, main.compile_text, fn, text, numeric)
+    self.compiling[(fn, text, numeric)] = future
+    try:
+      return await asyncio.shield(future)
+    finally:
+      self.compiling.pop((fn, text, numeric), None)
+
+  def stats(self):
+    latencies = sorted(self.latencies)
+    percentiles = {}
+
+    if latencies:
+      for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1)):
+        percentiles[name] = round(latencies[int(q * (len(latencies) - 1))] * 1000, 3)
+
+    return {
+      'requests': self.requests,
+      'coalesced': self.coalesced,
+      'pending': self.in_flight,
+      'latency_ms': percentiles,
+    }
+
+async def serve(host='127.0.0.1', port=8765, path=None, max_pending=64, workers=None):
+  server = Server(max_pending, workers)
+  limit = 1 << 20
+
+  if path:
+    listener = await asyncio.start_unix_server(server.handle_connection, path, limit=limit)
+  else:
+    listener = await asyncio.start_server(server.handle_connection, host, port, limit=limit)
+
+  sockets = ', '.join(str(sock.getsockname()) for sock in listener.sockets)
+  print(f'Serving on {sockets}', file=sys.stderr)
+
+  # Stop on SIGTERM as well as Ctrl-C, printing the final stats either way
+  stop = asyncio.Event()
+  try:
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+  except (NotImplementedError, AttributeError):
+    pass
+
+  try:
+    async with listener:
+      await stop.wait()
+  finally:
+    print(json.dumps(server.stats()), file=sys.stderr)
+    server.executor.shutdown(wait=False)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(prog='server.py')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=8765)
+  parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead of TCP')
+  parser.add_argument('--max-pending', type=int, default=64, help='requests in flight before reading pauses')
+  parser.add_argument('--workers', type=int, help='executor threads')
+  args = parser.parse_args()
+
+  try:
+    asyncio.run(serve(args.host, args.port, args.unix, args.max_pending, args.workers))
+  except KeyboardInterrupt:
+    pass
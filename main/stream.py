@@ -0,0 +1,137 @@
+from main import Interpreter, default_session
+from numeric import convert
+from lexer import Lexer, TOKEN_REGEX, BYTES_TOKEN_REGEX
+from parser import Parser
+from errors import RTError
+from tokens import TT_NEWLINE, TT_EOF
+import ast_cache
+import mmap
+import os
+
+# STREAMING
+# Reads a program in chunks and runs it one statement at a time, so memory
+# stays flat however long the input is and each result is available as soon
+# as its statement has run.
+def read_statements(f, chunk_size=1 << 16):
+  # Yields (window, start, stop, line_offset) per statement. The statement is
+  # window[start:stop]; the window widens it to the whole lines it sits on,
+  # from the newline before it, so positions and error excerpts come out the
+  # same as for the whole file
+  buffer = ''
+  buffer_line = 0
+  pos = 0
+
+  while True:
+    chunk = f.read(chunk_size)
+    buffer += chunk
+
+    # A statement can't be cut out until the newline ending its last line has
+    # been read. A NEWLINE token before that is final: any token that could
+    # still grow with the next chunk (a string, a comment) runs to the end of
+    # the buffer instead
+    limit = buffer.rfind('\n') if chunk else len(buffer)
+    stops = []
+    for match in TOKEN_REGEX.finditer(buffer, pos):
+      if match.start() > limit: break
+      if match.lastgroup == 'NEWLINE': stops.append(match.end())
+    if not chunk and pos < len(buffer): stops.append(len(buffer))
+
+    counted, line = 0, buffer_line
+    for stop in stops:
+      window_start = max(buffer.rfind('\n', 0, pos), 0)
+      window_stop = buffer.find('\n', stop - 1) + 1 or len(buffer)
+      line += buffer.count('\n', counted, window_start)
+      counted = window_start
+      yield buffer[window_start:window_stop], pos - window_start, stop - window_start, line
+      pos = stop
+
+    if not chunk: break
+
+    cut = max(buffer.rfind('\n', 0, pos), 0)
+    buffer_line += buffer.count('\n', 0, cut)
+    buffer = buffer[cut:]
+    pos -= cut
+
+def map_statements(mapping):
+  # Yields (start, stop) per statement of a whole mapped file, which the
+  # lexer then reads in place, so no part of the file is copied
+  start = 0
+  for match in BYTES_TOKEN_REGEX.finditer(mapping):
+    if match.lastgroup == 'NEWLINE':
+      yield start, match.end()
+      start = match.end()
+  if start < len(mapping): yield start, len(mapping)
+
+def evaluate_stream(fn, f, session=None, chunk_size=1 << 16):
+  return evaluate_statements(
+    (Lexer(fn, window, line).make_tokens(start, stop) for window, start, stop, line in read_statements(f, chunk_size)),
+    session
+  )
+
+def evaluate_mapping(fn, mapping, session=None):
+  # Every position refers back to the mapping, which stays open for as long
+  # as any of them (say, in an error) is alive
+  lexer = Lexer(fn, mapping)
+  return evaluate_statements((lexer.make_tokens(start, stop) for start, stop in map_statements(mapping)), session)
+
+def evaluate_file(fn, session=None):
+  with open(fn, 'rb') as f:
+    try:
+      mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+      # An empty file can't be mapped, and has nothing to run
+      return iter(())
+    stat = os.fstat(f.fileno())
+
+  # A script that parses is run from its cached AST; one that doesn't is
+  # streamed, so the statements before its error still run
+  if ast_cache.enabled and stat.st_size <= ast_cache.max_size:
+    node = ast_cache.load(fn, mapping, stat)
+    if node: return evaluate_nodes(node.element_nodes, session)
+  return evaluate_mapping(fn, mapping, session)
+
+def evaluate_nodes(nodes, session=None):
+  context = (session or default_session).new_context()
+  interpreter = Interpreter()
+
+  numeric = context.numeric
+
+  for node in nodes:
+    try:
+      with numeric.scope():
+        value = interpreter.visit(convert(node, numeric), context)
+    except RTError as error:
+      yield None, error
+      return
+    yield value, None
+
+def evaluate_statements(statements, session=None):
+  context = (session or default_session).new_context()
+  interpreter = Interpreter()
+  numeric = context.numeric
+  continued = False
+
+  for tokens, error in statements:
+    if error:
+      yield None, error
+      return
+
+    # Blank lines and comments separate statements without being one
+    if all(tok.type in (TT_NEWLINE, TT_EOF) for tok in tokens):
+      continue
+
+    # Statements after the first fail as they would in the whole program
+    ast = Parser(tokens).parse(continued)
+    if ast.error:
+      yield None, ast.error
+      return
+    continued = True
+
+    for node in ast.node.element_nodes:
+      try:
+        with numeric.scope():
+          value = interpreter.visit(convert(node, numeric), context)
+      except RTError as error:
+        yield None, error
+        return
+      yield value, None
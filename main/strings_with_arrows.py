@@ -1,9 +1,11 @@
 def string_with_arrows(text, pos_start, pos_end):
 	result = ''
+	# Bytes text (an mmap) is searched in place, decoding only the lines shown
+	newline = '\n' if isinstance(text, str) else b'\n'
 
 	# Calculate indices
-	idx_start = max(text.rfind('\n', 0, pos_start.idx), 0)
-	idx_end = text.find('\n', idx_start + 1)
+	idx_start = max(text.rfind(newline, 0, pos_start.idx), 0)
+	idx_end = text.find(newline, idx_start + 1)
 	if idx_end < 0: idx_end = len(text)
 	
 	# Generate each line
@@ -11,6 +13,7 @@ def string_with_arrows(text, pos_start, pos_end):
 	for i in range(line_count):
 		# Calculate line columns
 		line = text[idx_start:idx_end]
+		if newline == b'\n': line = line.decode('utf-8', 'replace').rstrip('\r')
 		col_start = pos_start.col if i == 0 else 0
 		col_end = pos_end.col if i == line_count - 1 else len(line) - 1
 
@@ -20,7 +23,7 @@ def string_with_arrows(text, pos_start, pos_end):
 
 		# Re-calculate indices
 		idx_start = idx_end
-		idx_end = text.find('\n', idx_start + 1)
+		idx_end = text.find(newline, idx_start + 1)
 		if idx_end < 0: idx_end = len(text)
 
 	return result.replace('\t', '')
@@ -1,11 +1,22 @@
+# A table maps names to values. Names from a frozen parent can never change,
+# so a table over one starts out with a copy of them and finds any name in
+# one dict probe; only a parent that can still change is walked, and lookup
+# is bound to whichever of the two the table needs
 class SymbolTable:
   def __init__(self, parent=None):
-    self.symbols = {}
-    self.parent = parent
+    if isinstance(parent, FrozenSymbolTable):
+      self.inherited = parent.symbols
+      self.symbols = dict(parent.symbols)
+      self.parent = parent.parent
+    else:
+      self.inherited = {}
+      self.symbols = {}
+      self.parent = parent
+    self.lookup = self.get if self.parent else self.symbols.get
 
   def get(self, name):
-    value = self.symbols.get(name, None)
-    if value == None and self.parent:
+    value = self.symbols.get(name)
+    if value is None and self.parent:
       return self.parent.get(name)
     return value
 
@@ -13,4 +24,31 @@ class SymbolTable:
     self.symbols[name] = value
 
   def remove(self, name):
-    del self.symbols[name]
\ No newline at end of file
+    # A name set over an inherited one uncovers it again
+    del self.symbols[name]
+    if name in self.inherited:
+      self.symbols[name] = self.inherited[name]
+
+  def frozen(self):
+    return FrozenSymbolTable(self)
+
+def table_of(names, parent=None):
+  # A table holding every name in names, filled in one go rather than name
+  # by name
+  table = SymbolTable(parent)
+  table.symbols.update(names)
+  return table
+
+# A frozen table is shared read-only between sessions and threads
+class FrozenSymbolTable(SymbolTable):
+  def __init__(self, table):
+    self.inherited = table.inherited
+    self.symbols = dict(table.symbols)
+    self.parent = table.parent
+    self.lookup = self.get if self.parent else self.symbols.get
+
+  def set(self, name, value):
+    raise TypeError('Symbol table is read-only')
+
+  def remove(self, name):
+    raise TypeError('Symbol table is read-only')
@@ -1,3 +1,5 @@
+from position import Position
+
 TT_INT				= 'INT'
 TT_FLOAT    	= 'FLOAT'
 TT_STRING			= 'STRING'
@@ -30,21 +32,26 @@ KEYWORDS = [
 ]
 
 class Token:
-  def __init__(self, type_, value=None, pos_start=None, pos_end=None):
+  __slots__ = ('type', 'value', 'source', 'start', 'end')
+
+  def __init__(self, type_, value=None, source=None, start=0, end=None):
     self.type = type_
     self.value = value
+    self.source = source
+    self.start = start
+    self.end = start + 1 if end is None else end
 
-    if pos_start:
-      self.pos_start = pos_start.copy()
-      self.pos_end = pos_start.copy()
-      self.pos_end.advance()
+  @property
+  def pos_start(self):
+    return Position(self.start, self.source)
 
-    if pos_end:
-      self.pos_end = pos_end.copy()
+  @property
+  def pos_end(self):
+    return Position(self.end, self.source, True)
 
   def matches(self, type_, value):
     return self.type == type_ and self.value == value
   
   def __repr__(self):
     if self.value: return f'{self.type}:{self.value}'
-    return f'{self.type}'
\ No newline at end of file
+    return f'{self.type}'
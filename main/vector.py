@@ -0,0 +1,275 @@
+from main import Number, BuiltInFunction
+from nodes import walk
+from context import Context
+from errors import RTError
+from tokens import *
+import numpy as np
+
+# VECTOR INTERPRETER
+# Evaluates an AST once with NumPy arrays in place of Number values, so a
+# formula can be swept over many bindings of its variables in one pass.
+# When strict is off, a division by zero or an argument out of a builtin's
+# domain gives NaN at that point instead of failing the whole sweep.
+class VectorInterpreter:
+  def __init__(self, bindings, strict=True):
+    self.bindings = dict(bindings)
+    self.strict = strict
+
+  def run(self, node, context):
+    value = None
+
+    for statement_node in node.element_nodes:
+      value = self.visit(statement_node, context)
+
+    return value
+
+  def visit(self, node, context):
+    methods = {}
+
+    def visit_node(node):
+      method = methods.get(type(node))
+      if method is None:
+        method_name = f'visit_{type(node).__name__}'
+        method = methods[type(node)] = getattr(self, method_name, self.no_visit_method)
+      return method(node, context)
+    return walk(node, visit_node)
+
+  def no_visit_method(self, node, context):
+    raise Exception(f'No visit_{type(node).__name__} method defined')
+
+  def not_supported(self, node, context):
+    raise RTError(
+      node.pos_start, node.pos_end,
+      'Batch mode only supports numbers',
+      context
+    )
+
+  def illegal_operation(self, node, context):
+    raise RTError(
+      node.pos_start, node.pos_end,
+      'Illegal operation',
+      context
+    )
+
+  ###################################
+
+  def visit_NumberNode(self, node, context):
+    return node.tok.value
+
+  def visit_StringNode(self, node, context):
+    self.not_supported(node, context)
+
+  def visit_ListNode(self, node, context):
+    self.not_supported(node, context)
+
+  def visit_VarAccessNode(self, node, context):
+    var_name = node.var_name_tok.value
+
+    if var_name in self.bindings:
+      return self.bindings[var_name]
+
+    value = context.symbol_table.get(var_name)
+
+    if not value:
+      # Worded as the scalar interpreter words it
+      details = f"'{var_name}' is wtf" if var_name == 'x' else f"'{var_name}' is not defined"
+      raise RTError(
+        node.pos_start, node.pos_end,
+        details,
+        context
+      )
+
+    if isinstance(value, Number):
+      return value.value
+    if isinstance(value, BuiltInFunction):
+      return value
+    self.not_supported(node, context)
+
+  def visit_VarAssignNode(self, node, context):
+    value = yield node.value_node
+
+    self.bindings[node.var_name_tok.value] = value
+    return value
+
+  def visit_BinOpNode(self, node, context):
+    left = yield node.left_node
+    right = yield node.right_node
+
+    if isinstance(left, BuiltInFunction) or isinstance(right, BuiltInFunction):
+      self.illegal_operation(node, context)
+
+    op_type = node.op_tok.type
+
+    if op_type in (TT_DIV, TT_MOD) and self.strict and np.any(np.equal(right, 0)):
+      raise RTError(
+        node.right_node.pos_start, node.right_node.pos_end,
+        'Division by zero' if op_type == TT_DIV else 'Mod by zero',
+        context
+      )
+
+    if op_type == TT_PLUS:
+      return np.add(left, right)
+    elif op_type == TT_MINUS:
+      return np.subtract(left, right)
+    elif op_type == TT_MUL:
+      return np.multiply(left, right)
+    elif op_type in (TT_DIV, TT_MOD):
+      result = (np.true_divide if op_type == TT_DIV else np.mod)(left, right)
+      if self.strict: return result
+      return np.where(np.equal(right, 0), np.nan, result)
+    elif op_type == TT_POW:
+      return np.power(np.asarray(left, dtype=float), right)
+    elif op_type == TT_EE:
+      return np.equal(left, right).astype(int)
+    elif op_type == TT_NE:
+      return np.not_equal(left, right).astype(int)
+    elif op_type == TT_LT:
+      return np.less(left, right).astype(int)
+    elif op_type == TT_GT:
+      return np.greater(left, right).astype(int)
+    elif op_type == TT_LTE:
+      return np.less_equal(left, right).astype(int)
+    elif op_type == TT_GTE:
+      return np.greater_equal(left, right).astype(int)
+    elif node.op_tok.matches(TT_KEYWORD, 'AND'):
+      return np.logical_and(left, right).astype(int)
+    elif node.op_tok.matches(TT_KEYWORD, 'OR'):
+      return np.logical_or(left, right).astype(int)
+
+  def visit_UnaryOpNode(self, node, context):
+    value = yield node.node
+
+    if isinstance(value, BuiltInFunction):
+      self.illegal_operation(node, context)
+
+    if node.op_tok.type == TT_MINUS:
+      return np.negative(value)
+    elif node.op_tok.matches(TT_KEYWORD, 'NOT'):
+      return np.logical_not(value).astype(int)
+    return value
+
+  def visit_CallNode(self, node, context):
+    args = []
+
+    value_to_call = yield node.node_to_call
+
+    if not isinstance(value_to_call, BuiltInFunction):
+      self.illegal_operation(node, context)
+
+    method = getattr(self, f'call_{value_to_call.name}', None)
+    if method and not self.strict:
+      method = getattr(self, f'call_{value_to_call.name}_lenient', method)
+    if not method:
+      raise RTError(
+        node.pos_start, node.pos_end,
+        f'{value_to_call.name.upper()} : Not supported in batch mode',
+        context
+      )
+
+    for arg_node in node.arg_nodes:
+      args.append((yield arg_node))
+
+    arg_names = method.arg_names
+    if len(args) > len(arg_names):
+      raise RTError(
+        node.pos_start, node.pos_end,
+        f"{len(args) - len(arg_names)} too many args passed into {value_to_call}",
+        context
+      )
+
+    if len(args) < len(arg_names):
+      raise RTError(
+        node.pos_start, node.pos_end,
+        f"{len(arg_names) - len(args)} too few args passed into {value_to_call}",
+        context
+      )
+
+    result, details = method(*args)
+    if details:
+      raise RTError(
+        node.pos_start, node.pos_end,
+        details,
+        Context(value_to_call.name, context, node.pos_start)
+      )
+
+    return result
+
+  #####################################
+  # Each call_<name> mirrors BuiltInFunction.execute_<name> over arrays and
+  # returns (result, error details).
+
+  def call_abs(self, value):
+    return np.abs(value), None
+  call_abs.arg_names = ['value']
+
+  def call_flr(self, value):
+    return np.floor(value), None
+  call_flr.arg_names = ['value']
+
+  def call_ceil(self, value):
+    return np.ceil(value), None
+  call_ceil.arg_names = ['value']
+
+  def call_log(self, value):
+    if np.any(np.less_equal(value, 0)):
+      return None, "LOG : Out of domain."
+    return np.round(np.log10(value), 2), None
+  call_log.arg_names = ['value']
+
+  def call_log_lenient(self, value):
+    return np.round(np.log10(np.where(np.less_equal(value, 0), np.nan, value)), 2), None
+  call_log_lenient.arg_names = ['value']
+
+  def call_sqrt(self, value):
+    if np.any(np.less(value, 0)):
+      return None, "SQRT : Argument must be an Integer, Float"
+    return np.sqrt(value), None
+  call_sqrt.arg_names = ['value']
+
+  def call_sqrt_lenient(self, value):
+    return np.sqrt(np.where(np.less(value, 0), np.nan, value)), None
+  call_sqrt_lenient.arg_names = ['value']
+
+  def call_sin(self, value):
+    return np.round(np.sin(np.radians(value)), 2), None
+  call_sin.arg_names = ['value']
+
+  def call_cos(self, value):
+    return np.round(np.cos(np.radians(value)), 2), None
+  call_cos.arg_names = ['value']
+
+  def call_cot(self, value):
+    return np.round(1 / np.tan(np.radians(value)), 2), None
+  call_cot.arg_names = ['value']
+
+  def call_tan(self, value):
+    return np.round(np.tan(np.radians(value)), 2), None
+  call_tan.arg_names = ['value']
+
+  def call_asin(self, value):
+    return np.round(np.arcsin(np.radians(value)), 2), None
+  call_asin.arg_names = ['value']
+
+  def call_acos(self, value):
+    return np.round(np.arccos(np.radians(value)), 2), None
+  call_acos.arg_names = ['value']
+
+  def call_acot(self, value):
+    return np.round((np.pi / 2) - np.arctan(np.radians(value)), 2), None
+  call_acot.arg_names = ['value']
+
+  def call_atan(self, value):
+    return np.round(np.arctan(np.radians(value)), 2), None
+  call_atan.arg_names = ['value']
+
+def evaluate(node, context, bindings, strict=True):
+  arrays = {name: np.asarray(value) for name, value in bindings.items()}
+  shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+
+  try:
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+      result = VectorInterpreter(arrays, strict).run(node, context)
+  except RTError as error:
+    return None, error
+
+  return np.broadcast_to(result, shape).copy(), None
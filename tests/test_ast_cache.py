@@ -0,0 +1,92 @@
+import mmap
+import os
+import tempfile
+import threading
+import unittest
+
+import tests
+import main
+import ast_cache
+from serialize import Encoder
+
+def tree(node):
+  return Encoder().encode(node)
+
+SCRIPT = 'VAR a = 2\nVAR b = [a, "s", 1.5]\n# note\n(a + 1) ^ 2 - SIN(30) / a\n'
+
+class AstCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.fn = os.path.join(self.directory.name, 'script.lan')
+    with open(self.fn, 'w') as f:
+      f.write(SCRIPT)
+    self.path = ast_cache.cache_path(self.fn)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def load(self):
+    with open(self.fn, 'rb') as f:
+      mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      stat = os.fstat(f.fileno())
+    return ast_cache.load(self.fn, mapping, stat)
+
+  def results(self):
+    return [(repr(value), error and error.as_string()) for value, error in main.run_file(self.fn, main.Session())]
+
+  def test_round_trip(self):
+    parsed = self.load()
+    entry = ast_cache.read_entry(self.path)
+    self.assertIsNotNone(entry)
+
+    cached = self.load()
+    self.assertEqual(tree(cached), tree(parsed))
+    self.assertEqual(ast_cache.read_entry(self.path), entry)
+    self.assertEqual(self.results(), [('2', None), ('[2, "s", 1.5]', None), ('8.75', None)])
+
+  def test_touched_script(self):
+    self.load()
+    stat = os.stat(self.fn)
+    os.utime(self.fn, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    self.assertEqual(tree(self.load()), tree(main.parse(self.fn, SCRIPT)[0]))
+    # The entry is brought up to the new mtime
+    self.assertEqual(ast_cache.read_entry(self.path)[1], os.stat(self.fn).st_mtime_ns)
+
+  def test_damaged_entries(self):
+    expected = self.results()
+    self.load()
+    with open(self.path, 'rb') as f:
+      data = f.read()
+
+    for damaged in (b'', b'junk', data[:len(data) // 2], ast_cache.MAGIC + b'\x00' * 40, data[:-3] + b'abc'):
+      with open(self.path, 'wb') as f:
+        f.write(damaged)
+      self.assertEqual(self.results(), expected)
+      self.assertIsNotNone(ast_cache.read_entry(self.path))
+
+  def test_entry_that_decodes_wrong(self):
+    self.load()
+    entry = list(ast_cache.read_entry(self.path))
+    entry[4] = ('not', 'a', 'tree')
+    ast_cache.write_entry(self.path, tuple(entry))
+    self.assertEqual(tree(self.load()), tree(main.parse(self.fn, SCRIPT)[0]))
+
+  def test_concurrent_writers(self):
+    # Threads writing their own entries to one path leave exactly one of them
+    entries = [(ast_cache.FORMAT, n, n, bytes(n), tuple(range(n * 1000))) for n in range(8)]
+    failures = []
+
+    def write(entry):
+      for _ in range(30):
+        ast_cache.write_entry(self.path, entry)
+        if ast_cache.read_entry(self.path) not in entries: failures.append(entry[1])
+    threads = [threading.Thread(target=write, args=(entry,)) for entry in entries]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+    self.assertEqual(failures, [])
+    self.assertIn(ast_cache.read_entry(self.path), entries)
+    self.assertEqual(os.listdir(os.path.dirname(self.path)), [os.path.basename(self.path)])
+
+if __name__ == '__main__':
+  unittest.main()
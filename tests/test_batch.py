@@ -0,0 +1,23 @@
+import unittest
+
+import numpy as np
+
+import tests
+import main
+from errors import RTError
+
+class BatchTest(unittest.TestCase):
+  def test_sweep(self):
+    values, error = main.run_batch('<f>', 'VAR y = 2\nx * y + 1', {'x': np.arange(3.0)})
+    self.assertIsNone(error)
+    self.assertEqual(values.tolist(), [1.0, 3.0, 5.0])
+
+  def test_other_backends_are_refused(self):
+    for numeric in ('decimal', 'fraction'):
+      values, error = main.run_batch('<f>', 'x * 0.1', {'x': np.arange(3.0)}, main.Session(numeric=numeric))
+      self.assertIsNone(values)
+      self.assertIsInstance(error, RTError)
+      self.assertEqual(error.details, 'Batch evaluation is float-only')
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,79 @@
+import contextlib
+import io
+import random
+import unittest
+
+import tests
+import main
+from main import Interpreter, Compiler
+from errors import RTError
+
+SETUP = 'VAR x = 3\nVAR y = 0\nVAR l = [1, 2, 3]\nVAR s = "hi"'
+
+def generate(rng, depth=0):
+  # An expression over the session's names, the operators and the builtins
+  k = rng.random()
+  if depth > 4 or k < 0.3:
+    return rng.choice(['0', '1', '2', '3', '1.5', '0.0', 'x', 'y', 'l', 's', 'MATH_PI', 'TRUE', '"ab"', '[1, 2]', '[]', 'z', 'NULL'])
+  if k < 0.5:
+    op = rng.choice(['+', '-', '*', '/', '%', '=='])
+    return f'{generate(rng, depth + 1)} {op} {generate(rng, depth + 1)}'
+  if k < 0.55:
+    return f'{generate(rng, depth + 1)} ^ {rng.choice(["2", "0.5", "-1", "x"])}'
+  if k < 0.65:
+    return rng.choice(['-', '+']) + rng.choice(['2', 'x', '1.5', '(x - 4)'])
+  if k < 0.75:
+    return f'({generate(rng, depth + 1)})'
+  if k < 0.88:
+    name = rng.choice(['SIN', 'COS', 'TAN', 'ATAN', 'ABS', 'FLR', 'CEIL', 'SQRT', 'LEN', 'PRINT_RET'])
+    count = rng.choice([1, 1, 1, 1, 0, 2])
+    return f'{name}({", ".join(generate(rng, depth + 1) for _ in range(count))})'
+  if k < 0.94:
+    return f'[{", ".join(generate(rng, depth + 1) for _ in range(rng.randint(0, 3)))}]'
+  return f'(VAR {rng.choice(["x", "y", "q"])} = {generate(rng, depth + 1)})'
+
+def outcome(program):
+  # What running a program does, in a form that compares across engines
+  session = main.Session()
+  session.run('<setup>', SETUP)
+  output = io.StringIO()
+  try:
+    with contextlib.redirect_stdout(output):
+      value = program(session.new_context())
+    result = ('value', repr(value))
+  except RTError as error:
+    result = ('error', error.as_string())
+  except Exception as error:
+    result = ('raised', type(error).__name__)
+  names = {name: repr(session.symbol_table.get(name)) for name in ('x', 'y', 'q')}
+  return result, names, output.getvalue()
+
+class CompilerTest(unittest.TestCase):
+  # The compiled program, plain and optimized, does what the interpreter does
+  def assert_same(self, text):
+    node, error = main.parse('<f>', text)
+    self.assertIsNone(error, text)
+
+    interpreted = outcome(lambda context: Interpreter().visit(node, context))
+    self.assertEqual(outcome(Compiler().compile(node)), interpreted, text)
+    self.assertEqual(outcome(main.compile_node(node)), interpreted, text)
+
+  def test_values(self):
+    for text in ('1 + 2 * 3 ^ 2', 'VAR q = x * 2\nq - 1', 'l + 4', 'l * [5]', 's * 3', '"a" + s', '[l, [s]] - 0', '-x ^ 2'):
+      self.assert_same(text)
+
+  def test_errors(self):
+    for text in ('x / y', 'x % 0', 'z + 1', 'l / 5', 's - 1', 'SIN(1, 2)', 'LEN(3)', 'VAR q = 1\nq + (2 / y)', '[1, 2] ^ 2'):
+      self.assert_same(text)
+
+  def test_rebound_builtins_and_constants(self):
+    for text in ('VAR SIN = 2\nSIN + 1', 'VAR MATH_PI = 3\nMATH_PI * 2', 'SIN(90) + MATH_PI', 'VAR ABS = SIN\nABS(90)'):
+      self.assert_same(text)
+
+  def test_generated_programs(self):
+    rng = random.Random(1)
+    for _ in range(1500):
+      self.assert_same(generate(rng))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import tests
+import main
+
+try:
+  import matplotlib
+  import draw
+except ImportError:
+  draw = None
+
+@unittest.skipIf(draw is None, 'DRAW needs NumPy and matplotlib')
+class BatchTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.output = draw.output
+
+  def tearDown(self):
+    draw.output = self.output
+    self.directory.cleanup()
+
+  def path(self, name):
+    return os.path.join(self.directory.name, name)
+
+  def test_batch_keeps_to_its_thread(self):
+    # Outside the batch, DRAW renders straight to draw.output
+    draw.output = self.path('direct_{n}.png')
+    errors = []
+
+    def other_session():
+      _, error = main.Session().run('<f>', 'DRAW(-10, 10, "x * 2")')
+      errors.append(error)
+
+    with draw.Batch(self.path('batch_{n}.png'), workers=0) as batch:
+      main.Session().run('<f>', 'DRAW(-10, 10, "x ^ 2")')
+      thread = threading.Thread(target=other_session)
+      thread.start()
+      thread.join()
+      main.Session().run('<f>', 'DRAW(-10, 10, "SIN(x)")')
+
+    self.assertEqual(errors, [None])
+    self.assertEqual(batch.paths, [self.path('batch_1.png'), self.path('batch_2.png')])
+    names = sorted(os.listdir(self.directory.name))
+    self.assertEqual([name for name in names if name.startswith('batch_')], ['batch_1.png', 'batch_2.png'])
+    self.assertEqual(len([name for name in names if name.startswith('direct_')]), 1)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,53 @@
+import threading
+import unittest
+
+import tests
+import main
+from main import Interpreter
+
+def parse(text):
+  node, error = main.parse('<f>', text)
+  assert error is None, error
+  return node
+
+def attributes(node):
+  # Every node of the tree with its attributes, to tell whether running it
+  # changed anything
+  nodes, seen = [node], []
+  while nodes:
+    node = nodes.pop()
+    if isinstance(node, list):
+      nodes.extend(node)
+    elif hasattr(node, '__dict__') and hasattr(node, 'pos_start'):
+      seen.append((type(node).__name__, sorted((name, id(value)) for name, value in vars(node).items())))
+      nodes.extend(vars(node).values())
+  return seen
+
+class InlineCacheTest(unittest.TestCase):
+  def test_types_changing_at_a_site(self):
+    node = parse('a + b')
+    interpreter = Interpreter()
+    results = []
+    for a, b in (('1', '2'), ('"x"', '"y"'), ('[1]', '2'), ('3', '4')):
+      session = main.Session()
+      session.run('<f>', f'VAR a = {a}\nVAR b = {b}')
+      results.append(repr(interpreter.visit(node, session.new_context())))
+    self.assertEqual(results, ['[3]', '["xy"]', '[[1, 2]]', '[7]'])
+
+  def test_shared_tree_is_left_alone(self):
+    node = parse('VAR a = 2\n(a * 3 + 1) / a - a ^ 2\n"s" * a + "t"')
+    before = attributes(node)
+    results = []
+
+    def run():
+      for _ in range(50):
+        results.append(repr(Interpreter().visit(node, main.Session().new_context())))
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+    self.assertEqual(attributes(node), before)
+    self.assertEqual(set(results), {'[2, -0.5, "sst"]'})
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+import tests
+import main
+from main import BuiltInFunction
+
+class MemoTest(unittest.TestCase):
+  def setUp(self):
+    self.memos = main.memoize_builtins(16)
+
+  def tearDown(self):
+    for name in self.memos:
+      main.memoize(main.builtin_symbol_table.get(name.upper()), 0)
+
+  def test_only_pure_builtins(self):
+    self.assertIn('log', self.memos)
+    for name in ('print', 'input', 'run', 'draw'):
+      self.assertNotIn(name, self.memos)
+    self.assertIsNone(main.memoize(BuiltInFunction.print))
+
+  def test_hits_and_errors(self):
+    session = main.Session()
+    for _ in range(3):
+      values, error = session.run('<f>', 'LOG(100); LOG(100.0)')
+      self.assertEqual(repr(values), '[2, 2]')
+      _, error = session.run('<f>', 'LOG(0)')
+      self.assertEqual(error.details, 'LOG : Out of domain.')
+
+    stats = main.memo_stats()['log']
+    self.assertEqual((stats['hits'], stats['misses']), (4, 5))
+
+if __name__ == '__main__':
+  unittest.main()
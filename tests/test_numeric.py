@@ -0,0 +1,62 @@
+import unittest
+
+import tests
+import main
+import numeric
+
+class BackendEdgeTest(unittest.TestCase):
+  def results(self, numeric, text):
+    values, error = main.Session(numeric=numeric).run('<f>', text)
+    self.assertIsNone(error, text)
+    return [repr(value) for value in values.elements]
+
+  def test_decimal_rounding_of_non_finite_values(self):
+    self.assertEqual(
+      self.results('decimal', 'FLR(TAN(90)); CEIL(COT(0)); CEIL(-TAN(90)); FLR(ASIN(90))'),
+      ['Infinity', 'Infinity', '-Infinity', 'NaN']
+    )
+
+  def test_decimal_rounding(self):
+    self.assertEqual(self.results('decimal', 'FLR(2.5); CEIL(-2.5); FLR(-0.5); CEIL(-0.5)'), ['2', '-2', '-1', '0'])
+
+  def test_fraction_log_past_float_range(self):
+    self.assertEqual(self.results('fraction', 'LOG(1000); LOG(1/100)'), ['3', '-2'])
+    big, small = self.results('fraction', 'LOG(2^2000); LOG(1/2^2000)')
+    self.assertAlmostEqual(float(big), 602.0599913279624)
+    self.assertAlmostEqual(float(small), -602.0599913279624)
+
+  def test_decimal_arithmetic_on_non_finite_values(self):
+    self.assertEqual(
+      self.results('decimal', 'TAN(90) + 1; -COT(0); TAN(90) - TAN(90); TAN(90) * 0; ASIN(90) == ASIN(90)'),
+      ['Infinity', '-Infinity', 'NaN', 'NaN', '0']
+    )
+
+  def test_rounding_agrees_across_backends(self):
+    for backend in ('float', 'fraction', 'decimal'):
+      self.assertEqual(self.results(backend, 'FLR(2.5); CEIL(-2.5); FLR(-0.5); CEIL(7/2)'), ['2', '-2', '-1', '4'], backend)
+
+  def test_log(self):
+    for backend in ('float', 'fraction', 'decimal'):
+      self.assertEqual(self.results(backend, 'LOG(1000); LOG(1/100)'), ['3', '-2'], backend)
+      for text in ('LOG(0)', 'LOG(-1)'):
+        _, error = main.Session(numeric=backend).run('<f>', text)
+        self.assertEqual(error.details, 'LOG : Out of domain.', backend)
+
+  def test_exact_backends(self):
+    self.assertEqual(self.results('float', '0.1 + 0.2'), ['0.30000000000000004'])
+    self.assertEqual(self.results('fraction', '0.1 + 0.2; 1/3 + SIN(30); 2 ^ -2; SQRT(1/4)'), ['3/10', '5/6', '1/4', '1/2'])
+    self.assertEqual(self.results('decimal', '0.1 + 0.2; 2 ^ -2; SQRT(1/4)'), ['0.3', '0.25', '0.5'])
+
+  def test_decimal_precision(self):
+    pi, third = self.results(numeric.DecimalBackend(50), 'MATH_PI; 1/3')
+    self.assertEqual(pi, '3.1415926535897932384626433832795028841971693993751')
+    self.assertEqual(third, '0.' + '3' * 50)
+
+  def test_whole_numbers_index_and_repeat(self):
+    for backend in ('fraction', 'decimal'):
+      self.assertEqual(self.results(backend, '[1, 2, 3] / (4/2); "ab" * (6/3)'), ['3', '"abab"'], backend)
+      _, error = main.Session(numeric=backend).run('<f>', '[1, 2, 3] / 1.5')
+      self.assertIsNotNone(error, backend)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,63 @@
+import time
+import unittest
+
+import tests
+import main
+from main import Optimizer
+from nodes import NumberNode, BinOpNode
+
+def optimize(text):
+  node, error = main.parse('<f>', text)
+  assert error is None, error
+  optimizer = Optimizer()
+  return optimizer.optimize(node).element_nodes, optimizer
+
+class OptimizerTest(unittest.TestCase):
+  def test_folds_literals_in_place(self):
+    (node,), _ = optimize('1 + 2 * (3 - 1) ^ 2')
+    self.assertIsInstance(node, NumberNode)
+    self.assertEqual(node.tok.value, 9)
+    self.assertEqual((node.pos_start.idx, node.pos_end.idx), (0, 19))
+
+  def test_folds_constants_and_pure_builtins_under_guards(self):
+    (node,), optimizer = optimize('2 * MATH_PI + SIN(90)')
+    self.assertIsInstance(node, BinOpNode)
+    self.assertIsInstance(node.left_node, NumberNode)
+    self.assertEqual(sorted(optimizer.assumptions), ['MATH_PI', 'SIN'])
+
+  def test_leaves_what_can_change(self):
+    # An assigned name, a call that isn't pure, a failing operation
+    for text in ('VAR MATH_PI = 3\nMATH_PI * 2', 'PRINT_RET(1) + MATH_PI', '1 / 0', '[1] * 2'):
+      nodes, _ = optimize(text)
+      self.assertNotIsInstance(nodes[-1], NumberNode, text)
+
+  def test_no_identities_on_untyped_operands(self):
+    session = main.Session()
+    session.run('<f>', 'VAR s = "ab"\nVAR l = [1, 2]')
+    # '* 1' and '- 0' aren't no-ops for strings and lists
+    self.assertEqual(repr(session.run('<f>', 's * 1; l - 0')[0]), '["ab", [2]]')
+    self.assertEqual(session.run('<f>', 'l * 1')[1].details, 'Illegal operation')
+
+  def test_huge_powers_are_left_for_the_run(self):
+    (node,), _ = optimize('10 ^ 10 ^ 6 % 7')
+    self.assertIsInstance(node, BinOpNode)
+    self.assertIsInstance(node.left_node, BinOpNode)
+    self.assertEqual(node.left_node.right_node.tok.value, 10 ** 6)
+
+    # Unreachable, so it never has to be computed at all
+    start = time.perf_counter()
+    _, error = main.Session().run('<f>', '1 / 0\n10 ^ 10 ^ 6 % 7')
+    self.assertLess(time.perf_counter() - start, 0.1)
+    self.assertEqual(error.details, 'Division by zero')
+
+  def test_small_and_inexact_powers_fold(self):
+    for text, value in (('2 ^ 10', 1024), ('2 ^ 0.5', 2 ** 0.5), ('1.5 ^ 10000', None)):
+      (node,), _ = optimize(text)
+      if value is None:
+        # Overflows, which is left to fail at run time
+        self.assertNotIsInstance(node, NumberNode, text)
+      else:
+        self.assertEqual(node.tok.value, value, text)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import tests
+import main
+import parallel
+
+def sequential(job):
+  # What one job gives run on its own, in a fresh session
+  fn, text = job[0], job[1]
+  session = main.Session()
+  for name, value in (job[2] if len(job) > 2 else {}).items():
+    session.symbol_table.set(name, main.Number(value))
+  return session.run(fn, text)
+
+def described(result):
+  value, error = result
+  return (repr(value), error.as_string() if error else None)
+
+class RunManyTest(unittest.TestCase):
+  @classmethod
+  def tearDownClass(cls):
+    parallel.shutdown()
+
+  def test_results_in_job_order(self):
+    jobs = [('<f>', 'x * 2 + SIN(90)', {'x': n}) for n in range(40)]
+    results = main.run_many(jobs, workers=2, chunksize=3)
+    self.assertEqual([described(result) for result in results], [described(sequential(job)) for job in jobs])
+    self.assertEqual(repr(results[5][0]), '[11.0]')
+
+  def test_errors_as_a_single_run_gives_them(self):
+    jobs = [
+      ('<a>', 'VAR y = x\n10 / (y - 3)', {'x': 3}),
+      ('<b>', '1 +'),
+      ('<c>', 'x + 1', {'x': 1}),
+      ('<c>', 'x + 1'),
+      ('<d>', 'VAR q = 2\nq ^ x', {'x': 0.5}),
+      ('<e>', '"s" - 1'),
+      ('<b>', '1 +'),
+    ]
+    results = main.run_many(jobs, workers=2, chunksize=1)
+    self.assertEqual([described(result) for result in results], [described(sequential(job)) for job in jobs])
+    self.assertIn('Division by zero', results[0][1].as_string())
+    self.assertIsNone(results[1][0])
+
+  def test_jobs_share_no_names(self):
+    jobs = [('<f>', 'VAR q = x\nq', {'x': n}) for n in range(10)] + [('<g>', 'q')]
+    results = main.run_many(jobs, workers=2, chunksize=2)
+    self.assertEqual(results[-1][1].details, "'q' is not defined")
+    self.assertEqual(main.Session().run('<g>', 'q')[1].details, "'q' is not defined")
+
+  def test_no_jobs(self):
+    self.assertEqual(main.run_many([]), [])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import tests
+import main
+
+def tree(text):
+  node, error = main.parse('<f>', text)
+  assert error is None, error
+  return [repr(element) for element in node.element_nodes]
+
+def syntax_error(text):
+  _, error = main.parse('<f>', text)
+  return error.details, error.pos_start.idx
+
+class ParserTest(unittest.TestCase):
+  def test_precedence_and_associativity(self):
+    self.assertEqual(tree('1 - 2 - 3'), ['((INT:1, MINUS, INT:2), MINUS, INT:3)'])
+    self.assertEqual(tree('2 ^ 3 ^ 2'), ['(INT:2, POW, (INT:3, POW, INT:2))'])
+    self.assertEqual(tree('-2 ^ 2'), ['(MINUS, (INT:2, POW, INT:2))'])
+    self.assertEqual(tree('1 + 2 * 3'), ['(INT:1, PLUS, (INT:2, MUL, INT:3))'])
+    self.assertEqual(tree('(1 + 2) * 3'), ['((INT:1, PLUS, INT:2), MUL, INT:3)'])
+    self.assertEqual(tree('1 + 2 == 3'), ['((INT:1, PLUS, INT:2), EE, INT:3)'])
+
+  def test_values(self):
+    values, error = main.Session().run('<f>', '2 ^ 3 ^ 2; -2 ^ 2; 8 / 4 / 2; - - 2; 2 * -3; VAR x = VAR y = 4\nx + y')
+    self.assertIsNone(error)
+    self.assertEqual(repr(values), '[512, -4, 1.0, 2, -6, 4, 8]')
+
+  def test_syntax_errors(self):
+    self.assertEqual(syntax_error('1 +'), ("Expected int, float, identifier, '+', '-', '(', '['", 3))
+    self.assertEqual(syntax_error('(1 + 2'), ("Expected ')'", 6))
+    self.assertEqual(syntax_error('VAR = 3'), ('Expected identifier', 4))
+    self.assertEqual(syntax_error('[1, 2'), ("Expected ',' or ']'", 5))
+    self.assertEqual(syntax_error('1 2'), ('Token cannot appear after previous tokens', 2))
+    self.assertEqual(syntax_error('ABS(-3)(1)'), ('Token cannot appear after previous tokens', 7))
+
+  def test_deep_nesting(self):
+    # No recursion per operator, so long machine-made formulas parse
+    values, error = main.Session().run('<f>', ' + '.join(['1'] * 20000) + '; ' + '(' * 3000 + '1' + ')' * 3000 + '; ' + '-' * 3000 + '1')
+    self.assertIsNone(error)
+    self.assertEqual(repr(values), '[20000, 1, 1]')
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import unittest
+
+import tests
+from server import Server
+
+class PipelineTest(unittest.TestCase):
+  def pipeline(self, lines, limit=1 << 16):
+    # Sends every line before reading anything back, as a pipelining client does
+    async def exchange():
+      server = Server()
+      listener = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0, limit=limit)
+      port = listener.sockets[0].getsockname()[1]
+      try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(''.join(line + '\n' for line in lines).encode())
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in lines]
+        writer.close()
+        await writer.wait_closed()
+        return responses
+      finally:
+        listener.close()
+        await listener.wait_closed()
+        server.executor.shutdown(wait=True)
+    return asyncio.run(exchange())
+
+  def test_bad_lines_keep_their_place(self):
+    requests = [
+      {'id': 1, 'text': 'VAR x = 2'},
+      {'id': 2, 'text': 'x ^ 2'},
+      'garbage',
+      {'id': 4, 'text': '1 +'},
+      {'id': 5, 'text': 'x / 0'},
+      {'op': 'stats'},
+      {'id': 7, 'text': 'VAR x = x + 1'},
+      '[1, 2]',
+      {'id': 9, 'text': 'x'},
+    ]
+    lines = [request if isinstance(request, str) else json.dumps(request) for request in requests]
+    responses = self.pipeline(lines)
+
+    self.assertEqual([response.get('id') for response in responses], [1, 2, None, 4, 5, None, 7, None, 9])
+    self.assertEqual(responses[1]['value'], '[4]')
+    self.assertTrue(responses[2]['error'].startswith('Bad request'))
+    self.assertIn('Expected', responses[3]['error'])
+    self.assertIn('Division by zero', responses[4]['error'])
+    self.assertIn('latency_ms', responses[5])
+    self.assertTrue(responses[7]['error'].startswith('Bad request'))
+    self.assertEqual(responses[8]['value'], '[3]')
+
+  def test_long_lines_are_refused_in_place(self):
+    requests = [
+      {'id': 1, 'text': 'VAR x = 2'},
+      {'id': 2, 'text': '1 + ' * 30 + '1'},
+      {'id': 3, 'text': 'x + 1'},
+      {'id': 4, 'text': '1 + ' * 100000 + '1'},
+      {'id': 5, 'text': 'x * 3'},
+    ]
+    responses = self.pipeline([json.dumps(request) for request in requests], limit=64)
+
+    self.assertEqual([response.get('id') for response in responses], [1, None, 3, None, 5])
+    self.assertEqual(responses[1]['error'], 'Bad request: line too long')
+    self.assertEqual(responses[2]['value'], '[3]')
+    self.assertEqual(responses[3]['error'], 'Bad request: line too long')
+    self.assertEqual(responses[4]['value'], '[6]')
+
+if __name__ == '__main__':
+  unittest.main()
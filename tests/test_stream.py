@@ -0,0 +1,96 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+
+import tests
+import main
+from errors import RTError
+
+class StreamErrorTest(unittest.TestCase):
+  # A script that fails to parse gives the same syntax error streamed, run
+  # from a file, and run whole
+  def assert_same_error(self, text):
+    _, error = main.Session().run('<f>', text)
+
+    with tempfile.TemporaryDirectory() as directory:
+      fn = os.path.join(directory, 'script.lan')
+      with open(fn, 'w') as f:
+        f.write(text)
+
+      for results in (main.run_stream('<f>', io.StringIO(text), main.Session()), main.run_file(fn, main.Session())):
+        streamed = None
+        for _, streamed in results:
+          pass
+        if isinstance(streamed, RTError): continue
+        self.assertEqual(streamed.as_string().replace(fn, '<f>'), error.as_string(), text)
+
+  def test_statement_breaking_off(self):
+    self.assert_same_error('VAR a = 2\nVAR b = (a +\n')
+
+  def test_statement_that_cannot_start(self):
+    self.assert_same_error('VAR a = 2\n) + a\n')
+    self.assert_same_error('VAR a = 2\n\n* 3')
+
+  def test_first_statement(self):
+    self.assert_same_error('VAR a = (2 +\nVAR b = 3\n')
+    self.assert_same_error('\n) + 1\n')
+
+  def test_trailing_token(self):
+    self.assert_same_error('VAR a = 2\na 3\n')
+
+  def test_generated_scripts(self):
+    rng = random.Random(0)
+    pieces = ['VAR', 'a', '=', '1', '2.5', '+', '-', '*', '^', '(', ')', '[', ']', ',', '"s"', 'SIN', '==', '\n']
+    statements = ['VAR a = 2', 'a ^ 2', 'SIN(30)', '[1, 2] / 0', '']
+
+    for _ in range(300):
+      lines = [
+        rng.choice(statements) if rng.random() < 0.6 else ' '.join(rng.choice(pieces) for _ in range(rng.randint(1, 6)))
+        for _ in range(rng.randint(2, 4))
+      ]
+      text = '\n'.join(lines) + '\n'
+      _, error = main.Session().run('<f>', text)
+      if error and not isinstance(error, RTError) and text.strip():
+        self.assert_same_error(text)
+
+class LineEndingTest(unittest.TestCase):
+  def run_script(self, text):
+    with tempfile.TemporaryDirectory() as directory:
+      fn = os.path.join(directory, 'script.lan')
+      with open(fn, 'w', newline='') as f:
+        f.write(text)
+      session = main.Session()
+      results = [(value and repr(value), error and error.as_string().replace(fn, '<f>')) for value, error in main.run_file(fn, session)]
+      ran, error = session.run('<f>', f'RUN("{fn}")\nq')
+      return results, (repr(ran) if ran else None, error and error.as_string().replace(fn, '<f>'))
+
+  # A script saved with Windows line endings runs as it would with Unix ones
+  def test_crlf_script(self):
+    for text in ('VAR q = 5\r\nVAR q = q * 2\r\n', 'VAR q = 5\r\n# note\r\nq / 0\r\n', 'VAR q = 5\r\nq +\r\n'):
+      self.assertEqual(self.run_script(text), self.run_script(text.replace('\r\n', '\n')), text)
+
+class RunTest(unittest.TestCase):
+  def test_missing_script(self):
+    _, error = main.Session().run('<f>', 'RUN("no/such/script.lan")')
+    self.assertTrue(error.details.startswith('Failed to load script "no/such/script.lan"'))
+
+  # An OSError raised while the script runs, by a builtin writing a file say,
+  # isn't a failure to load it
+  def test_error_while_running(self):
+    class Failing(main.BaseFunction):
+      def execute(self, args, context, pos_start, pos_end):
+        raise OSError('disk full')
+
+    with tempfile.TemporaryDirectory() as directory:
+      fn = os.path.join(directory, 'script.lan')
+      with open(fn, 'w') as f:
+        f.write('VAR a = 1\nWRITE()\n')
+      session = main.Session()
+      session.symbol_table.set('WRITE', Failing('write'))
+      with self.assertRaisesRegex(OSError, 'disk full'):
+        session.run('<f>', f'RUN("{fn}")')
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+import tests
+import main
+from symbol_table import SymbolTable, table_of
+
+class SymbolTableTest(unittest.TestCase):
+  def test_sessions_keep_their_names(self):
+    first, second = main.Session(), main.Session(numeric='decimal')
+    first.run('<f>', 'VAR SIN = 2\nVAR only_first = 1')
+    self.assertEqual(repr(first.run('<f>', 'SIN + only_first')[0]), '[3]')
+    self.assertEqual(repr(second.run('<f>', 'SIN(90)')[0]), '[1]')
+    self.assertEqual(second.run('<f>', 'only_first')[1].details, "'only_first' is not defined")
+    self.assertIs(main.builtin_symbol_table.get('SIN'), main.BuiltInFunction.sin)
+
+  def test_frozen_layers(self):
+    builtins = table_of({'a': 1, 'b': 2}).frozen()
+    with self.assertRaises(TypeError):
+      builtins.set('a', 3)
+
+    table = SymbolTable(builtins)
+    table.set('a', 3)
+    self.assertEqual((table.lookup('a'), table.lookup('b')), (3, 2))
+    table.remove('a')
+    self.assertEqual(table.get('a'), 1)
+    with self.assertRaises(KeyError):
+      table.remove('c')
+
+  def test_changing_parent_is_walked(self):
+    parent = SymbolTable(table_of({'a': 1}).frozen())
+    child = SymbolTable(parent)
+    parent.set('b', 2)
+    self.assertEqual((child.lookup('a'), child.lookup('b'), child.lookup('c')), (1, 2, None))
+
+if __name__ == '__main__':
+  unittest.main()